@@ -50,13 +50,32 @@ begin
   end if;
 end$$;
 
+-- Named datasets share both tables: every row carries metadata.dataset.
+-- Rows stored before datasets existed belong to the default dataset.
+update public.sales_collection
+set metadata = coalesce(metadata, '{}'::jsonb) || '{"dataset": "default"}'::jsonb
+where metadata is null or not metadata ? 'dataset';
+
+update public.faq_collection
+set metadata = coalesce(metadata, '{}'::jsonb) || '{"dataset": "default"}'::jsonb
+where metadata is null or not metadata ? 'dataset';
+
+create index if not exists sales_collection_dataset_idx on public.sales_collection ((metadata->>'dataset'));
+create index if not exists faq_collection_dataset_idx on public.faq_collection ((metadata->>'dataset'));
+
+-- Signatures gained a filter argument; drop the old ones so RPC calls stay unambiguous
+drop function if exists public.match_documents(vector, int, float, text);
+drop function if exists public.match_documents_sales(vector, int, float);
+drop function if exists public.match_documents_faq(vector, int, float);
 
 -- 3) Generic match function (cosine similarity; similarity = 1 - distance)
+--    filter: rows whose metadata contains it, e.g. {"dataset": "default"}
 create or replace function public.match_documents(
   query_embedding vector(3072),
   match_count int default 8,
   similarity_threshold float default 0.0,
-  table_name text default 'sales_collection'
+  table_name text default 'sales_collection',
+  filter jsonb default '{}'
 )
 returns table (
   id uuid,
@@ -76,12 +95,13 @@ begin
       metadata,
       1 - (embedding <=> $1) as similarity
     from %I
-    where (1 - (embedding <=> $1)) >= $3
+    where metadata @> $4
+      and (1 - (embedding <=> $1)) >= $3
     order by embedding <=> $1
     limit $2
   $f$, table_name);
 
-  return query execute sql using query_embedding, match_count, similarity_threshold;
+  return query execute sql using query_embedding, match_count, similarity_threshold, filter;
 end;
 $$;
 
@@ -89,7 +109,8 @@ $$;
 create or replace function public.match_documents_sales(
   query_embedding vector(3072),
   match_count int default 8,
-  similarity_threshold float default 0.0
+  similarity_threshold float default 0.0,
+  filter jsonb default '{}'
 )
 returns table (
   id uuid,
@@ -100,13 +121,14 @@ returns table (
 language sql
 as $$
   select id, content, metadata, similarity
-  from public.match_documents(query_embedding, match_count, similarity_threshold, 'sales_collection');
+  from public.match_documents(query_embedding, match_count, similarity_threshold, 'sales_collection', filter);
 $$;
 
 create or replace function public.match_documents_faq(
   query_embedding vector(3072),
   match_count int default 8,
-  similarity_threshold float default 0.0
+  similarity_threshold float default 0.0,
+  filter jsonb default '{}'
 )
 returns table (
   id uuid,
@@ -117,5 +139,5 @@ returns table (
 language sql
 as $$
   select id, content, metadata, similarity
-  from public.match_documents(query_embedding, match_count, similarity_threshold, 'faq_collection');
+  from public.match_documents(query_embedding, match_count, similarity_threshold, 'faq_collection', filter);
 $$;
@@ -1,9 +1,36 @@
 import os
-from supabase import create_client, Client
+import threading
+from typing import TYPE_CHECKING, Optional
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from supabase import AsyncClient, Client
+
 load_dotenv()
 
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
-supabase_client: Client = create_client(url, key)
\ No newline at end of file
+
+_client: Optional["Client"] = None
+_client_lock = threading.Lock()
+
+def get_supabase_client() -> "Client":
+    """Created on first use: importing supabase and opening its HTTP clients is slow."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from supabase import create_client
+
+            _client = create_client(url, key)
+        return _client
+
+async def create_async_supabase_client() -> "AsyncClient":
+    from supabase import acreate_client
+
+    return await acreate_client(url, key)
+
+def __getattr__(name: str):
+    # keeps `from Supabase.client import supabase_client` working
+    if name == "supabase_client":
+        return get_supabase_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,66 @@
+import csv
+import random
+from pathlib import Path
+from typing import List
+
+from graph.retrievals.loaders import FIELDS, MONTH_NAMES
+
+FAQ_TOPICS = [
+    ("refund period", "Refunds are allowed within {n} days of purchase."),
+    ("refund method", "Refunds are sent to the original payment method within {n} business days."),
+    ("return condition", "Items must be unused and returned within {n} days with all tags attached."),
+    ("shipping cost", "Standard shipping costs {n} dollars; orders above {m} dollars ship free."),
+    ("exchange policy", "Exchanges are processed within {n} days once the item is received."),
+    ("warranty", "Electronics carry a {n}-month limited warranty against manufacturing defects."),
+    ("gift cards", "Gift cards expire after {n} months and cannot be redeemed for cash."),
+    ("price match", "We match competitor prices up to {n} days after purchase."),
+]
+
+def write_sales_csv(path: Path, rows: int, seed: int = 7) -> Path:
+    """Month,Year,Total_Sales,Transactions rows, twelve months per year starting in 1900."""
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for i in range(rows):
+            tx = rng.randint(50, 500)
+            writer.writerow([MONTH_NAMES[i % 12], 1900 + i // 12, tx * rng.randint(8, 15), tx])
+    return path
+
+def write_faq_txt(path: Path, kilobytes: int, seed: int = 7) -> Path:
+    """Q/A paragraphs in the layout of uploads/faq_data.txt until the file reaches the requested size."""
+    rng = random.Random(seed)
+    target = kilobytes * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        i = 0
+        while written < target:
+            topic, answer = FAQ_TOPICS[i % len(FAQ_TOPICS)]
+            block = (f"Q{i + 1}: What is the {topic} for plan {i // len(FAQ_TOPICS)}?\n"
+                     f"A: {answer.format(n=rng.randint(2, 90), m=rng.randint(50, 500))}\n\n")
+            f.write(block)
+            written += len(block.encode("utf-8"))
+            i += 1
+    return path
+
+def questions(count: int, rows: int, seed: int = 7) -> List[str]:
+    """Distinct questions spread over every route label, so the answer cache does not short-circuit."""
+    rng = random.Random(seed)
+    last_year = 1900 + max(0, rows - 1) // 12
+    out = []
+    for i in range(count):
+        year = rng.randint(1900, last_year)
+        month = MONTH_NAMES[rng.randrange(12)]
+        topic = FAQ_TOPICS[rng.randrange(len(FAQ_TOPICS))][0]
+        kind = i % 5
+        if kind == 0:
+            out.append(f"What were the total sales across all months in {year}? (#{i})")
+        elif kind == 1:
+            out.append(f"Find the month in which total sales is equal to {rng.randint(400, 7500)} (#{i})")
+        elif kind == 2:
+            out.append(f"What is the {topic}? (#{i})")
+        elif kind == 3:
+            out.append(f"Show sales for {month} {year} and explain the {topic} (#{i})")
+        else:
+            out.append(f"Average total sales in {year} and the {topic} overall (#{i})")
+    return out
@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+EMBED_DIM = 64
+LLM_LATENCY_MS = float(os.environ.get("BENCH_LLM_LATENCY_MS", "200"))
+LLM_TOKEN_MS = float(os.environ.get("BENCH_LLM_TOKEN_MS", "5"))  # per streamed chunk
+EMBED_LATENCY_MS = float(os.environ.get("BENCH_EMBED_LATENCY_MS", "50"))  # per embedding call
+DB_LATENCY_MS = float(os.environ.get("BENCH_DB_LATENCY_MS", "20"))  # per PostgREST/RPC round trip
+ROUTER_MARKER = "Answer with one label exactly"
+LABELS = ("FAQ", "SALES_SAMPLE", "SALES_COMPLETE", "SALES_SAMPLE+FAQ", "SALES_COMPLETE+FAQ")
+
+def _stable_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+def fake_vector(text: str, dim: int = EMBED_DIM) -> List[float]:
+    """Hashed bag-of-words: deterministic, and similar texts get similar vectors."""
+    v = np.zeros(dim, dtype=np.float32)
+    for token in text.lower().split():
+        v[_stable_hash(token) % dim] += 1.0
+    norm = float(np.linalg.norm(v)) or 1.0
+    return (v / norm).tolist()
+
+class FakeEmbeddings(Embeddings):
+    """Stands in for GoogleGenerativeAIEmbeddings; one simulated round trip per call."""
+
+    def __init__(self, *args, latency_ms: float = EMBED_LATENCY_MS, **kwargs):
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self.texts = 0
+
+    def embed_documents(self, texts: List[str], *args, **kwargs) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        time.sleep(self.latency_ms / 1000)
+        return [fake_vector(t) for t in texts]
+
+    def embed_query(self, text: str, *args, **kwargs) -> List[float]:
+        return self.embed_documents([text])[0]
+
+class FakeChat(BaseChatModel):
+    """Stands in for ChatGoogleGenerativeAI: routes by hash, answers with a prompt-sized stub."""
+
+    model: str = "fake"
+    temperature: float = 0.0
+    latency_ms: float = LLM_LATENCY_MS
+    token_ms: float = LLM_TOKEN_MS
+
+    @property
+    def _llm_type(self) -> str:
+        return "bench-fake"
+
+    def _reply(self, messages) -> str:
+        prompt = messages[-1].content
+        if ROUTER_MARKER in prompt:
+            return LABELS[_stable_hash(prompt) % len(LABELS)]
+        return f"Answer based on {len(prompt)} prompt characters. " * 4
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency_ms / 1000)
+        for word in self._reply(messages).split(" "):
+            time.sleep(self.token_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency_ms / 1000)
+        for word in self._reply(messages).split(" "):
+            await asyncio.sleep(self.token_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+
+class _Params(dict):
+    def set(self, key, value) -> "_Params":
+        params = _Params(self)
+        params[key] = value
+        return params
+
+class _Table:
+    def __init__(self):
+        self.rows: Dict[str, Dict] = {}
+        self.version = 0
+        self._ordered: Optional[List[Dict]] = None
+        self._matrix = None
+
+    def write(self) -> None:
+        self.version += 1
+        self._ordered = None
+        self._matrix = None
+
+    def ordered(self) -> List[Dict]:
+        # cached row list, so paging a large table is O(page) rather than O(table)
+        if self._ordered is None:
+            self._ordered = list(self.rows.values())
+        return self._ordered
+
+    def matrix(self):
+        if self._matrix is None:
+            rows = self.ordered()
+            if not rows:
+                # an empty table (e.g. CSV-only upload) searches to nothing instead of failing the reshape
+                self._matrix = np.zeros((0, EMBED_DIM), dtype=np.float32)
+                return self._matrix
+            m = np.asarray([r["embedding"] for r in rows], dtype=np.float32).reshape(len(rows), -1)
+            self._matrix = m / np.maximum(np.linalg.norm(m, axis=1, keepdims=True), 1e-12)
+        return self._matrix
+
+class _Query:
+    """The subset of the postgrest query builder used by the ingestion and retrieval code."""
+
+    def __init__(self, db: "InMemorySupabase", table: str):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.count = None
+        self.filters = []
+        self.window = None
+        self.payload: List[Dict] = []
+
+    def select(self, columns: str = "*", count=None) -> "_Query":
+        self.op, self.columns, self.count = "select", columns, count
+        return self
+
+    def insert(self, rows, **kwargs) -> "_Query":
+        self.op, self.payload = "upsert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    upsert = insert
+
+    def delete(self) -> "_Query":
+        self.op = "delete"
+        return self
+
+    def order(self, *args, **kwargs) -> "_Query":
+        return self
+
+    def range(self, start: int, end: int) -> "_Query":
+        self.window = (start, end + 1)
+        return self
+
+    def limit(self, n: int) -> "_Query":
+        self.window = (0, n)
+        return self
+
+    @property
+    def not_(self):
+        query = self
+        return SimpleNamespace(is_=lambda col, value: query._where(lambda r: r.get(col) is not None))
+
+    def eq(self, col: str, value) -> "_Query":
+        return self._where(lambda r: _field(r, col) == value)
+
+    def in_(self, col: str, values) -> "_Query":
+        values = set(values)
+        return self._where(lambda r: _field(r, col) in values)
+
+    def contains(self, col: str, value: Dict) -> "_Query":
+        return self._where(lambda r: all((r.get(col) or {}).get(k) == v for k, v in value.items()))
+
+    def _where(self, predicate) -> "_Query":
+        self.filters.append(predicate)
+        return self
+
+    def _run(self):
+        table = self.db.table_data(self.table)
+        with self.db.lock:
+            if self.op == "upsert":
+                out = []
+                for row in self.payload:
+                    row = dict(row)
+                    row.setdefault("id", str(uuid.uuid4()))
+                    table.rows[row["id"]] = row
+                    out.append(row)
+                table.write()
+                return SimpleNamespace(data=out, count=None)
+            rows = table.ordered()
+            if self.filters:
+                rows = [r for r in rows if all(f(r) for f in self.filters)]
+            if self.op == "delete":
+                for r in rows:
+                    table.rows.pop(r["id"], None)
+                table.write()
+                return SimpleNamespace(data=rows, count=None)
+            total = len(rows)
+            if self.window:
+                rows = rows[self.window[0]:self.window[1]]
+        if self.columns != "*":
+            cols = [c.strip() for c in self.columns.split(",")]
+            rows = [{c: r.get(c) for c in cols} for r in rows]
+        return SimpleNamespace(data=rows, count=total if self.count else None)
+
+    def execute(self):
+        time.sleep(self.db.latency_ms / 1000)
+        return self._run()
+
+class _AsyncQuery(_Query):
+    async def execute(self):
+        await asyncio.sleep(self.db.latency_ms / 1000)
+        return self._run()
+
+def _field(row: Dict, col: str):
+    if "->>" in col:
+        outer, inner = col.split("->>")
+        return (row.get(outer) or {}).get(inner.strip("'"))
+    return row.get(col)
+
+class _Rpc:
+    """match_documents_* over the in-memory table: cosine top-k with an optional metadata filter."""
+
+    def __init__(self, db: "InMemorySupabase", name: str, args: Dict):
+        self.db = db
+        self.name = name
+        self.args = args
+        self.params = _Params()
+
+    def execute(self):
+        time.sleep(self.db.latency_ms / 1000)
+        table = self.db.table_data(self.db.rpc_tables.get(self.name, self.name))
+        with self.db.lock:
+            rows, matrix = table.ordered(), table.matrix()
+        if not rows:
+            return SimpleNamespace(data=[])
+        q = np.asarray(self.args["query_embedding"], dtype=np.float32)
+        scores = matrix @ (q / (np.linalg.norm(q) or 1.0))
+        flt = self.args.get("filter") or {}
+        if flt:
+            mask = np.fromiter((all((r.get("metadata") or {}).get(k) == v for k, v in flt.items()) for r in rows),
+                               dtype=bool, count=len(rows))
+            scores = np.where(mask, scores, -np.inf)
+        k = min(int(self.params.get("limit", 10)), len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        data = [{"id": rows[i]["id"], "content": rows[i]["content"], "metadata": rows[i]["metadata"],
+                 "similarity": float(scores[i])} for i in top if np.isfinite(scores[i])]
+        return SimpleNamespace(data=data)
+
+class InMemorySupabase:
+    """Stand-in for supabase.Client covering table CRUD, paging with counts and the match RPCs."""
+
+    query_class = _Query
+
+    def __init__(self, latency_ms: float = DB_LATENCY_MS, tables: Optional[Dict[str, _Table]] = None):
+        self.latency_ms = latency_ms
+        self.tables: Dict[str, _Table] = tables if tables is not None else {}
+        self.lock = threading.RLock()
+        self.rpc_tables = {"match_documents_sales": "sales_collection", "match_documents_faq": "faq_collection"}
+
+    def table_data(self, name: str) -> _Table:
+        with self.lock:
+            return self.tables.setdefault(name, _Table())
+
+    def table(self, name: str) -> _Query:
+        return self.query_class(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Dict) -> _Rpc:
+        return _Rpc(self, name, params)
+
+class AsyncInMemorySupabase(InMemorySupabase):
+    """supabase.AsyncClient view over the same tables (awaitable execute)."""
+
+    query_class = _AsyncQuery
+
+def install(db_latency_ms: float = DB_LATENCY_MS) -> InMemorySupabase:
+    """Patch the client factories before the app is imported; returns the shared in-memory store."""
+    import langchain_google_genai
+    import supabase
+
+    db = InMemorySupabase(db_latency_ms)
+
+    async def acreate_client(*args, **kwargs):
+        client = AsyncInMemorySupabase(db_latency_ms, db.tables)
+        client.lock = db.lock
+        return client
+
+    supabase.create_client = lambda *args, **kwargs: db
+    supabase.acreate_client = acreate_client
+    langchain_google_genai.ChatGoogleGenerativeAI = FakeChat
+    langchain_google_genai.GoogleGenerativeAIEmbeddings = FakeEmbeddings
+    return db
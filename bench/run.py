@@ -0,0 +1,228 @@
+"""Offline benchmark: drives /upload and /ask against fake Gemini models and an in-memory Supabase.
+
+    python -m bench.run --rows 1000,100000 --concurrency 1,8,32 --requests 200
+    python -m bench.run --save-baseline          # record bench/baseline.json
+    python -m bench.run --env LOCAL_VECTOR_INDEX=1 # compare a configuration against the baseline
+
+Each scenario runs in its own interpreter so peak RSS and module-level caches are per scenario.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = ROOT / "bench" / "baseline.json"
+# metric -> direction that counts as worse
+COMPARED = {
+    "ingest_s": "higher",
+    "p50_ms": "higher",
+    "p95_ms": "higher",
+    "p99_ms": "higher",
+    "throughput_rps": "lower",
+    "peak_rss_mb": "higher",
+}
+
+def scenario_key(s: Dict) -> str:
+    return f"{s['endpoint']} rows={s['rows']} faq_kb={s['faq_kb']} c={s['concurrency']}"
+
+def peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # KiB on Linux
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))], 2)
+
+async def _drive(scenario: Dict, workdir: Path) -> Dict:
+    import httpx
+
+    from bench import datasets
+
+    import main
+
+    csv_path = datasets.write_sales_csv(workdir / "sales_data.csv", scenario["rows"])
+    txt_path = datasets.write_faq_txt(workdir / "faq_data.txt", scenario["faq_kb"])
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        with open(csv_path, "rb") as csv_file, open(txt_path, "rb") as txt_file:
+            resp = await client.post("/upload", files=[("files", ("sales_data.csv", csv_file, "text/csv")),
+                                                       ("files", ("faq_data.txt", txt_file, "text/plain"))])
+        resp.raise_for_status()
+        while True:
+            job = (await client.get(resp.json()["status_url"])).json()
+            if job["stage"] in ("done", "failed"):
+                break
+            await asyncio.sleep(0.05)
+        ingest_s = time.perf_counter() - start
+        if job["stage"] == "failed":
+            raise RuntimeError(f"ingestion failed: {job['error']}")
+        rss_after_ingest = peak_rss_mb()
+
+        sem = asyncio.Semaphore(scenario["concurrency"])
+        latencies: List[float] = []
+        first_token: List[float] = []
+        errors = 0
+
+        async def ask(q: str) -> None:
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    if scenario["endpoint"] == "stream":
+                        # ASGITransport buffers the body, so time-to-first-token comes from the done event
+                        async with client.stream("POST", "/ask/stream", json={"q": q}) as r:
+                            event = None
+                            async for line in r.aiter_lines():
+                                if line.startswith("event: "):
+                                    event = line[len("event: "):]
+                                    errors += event == "error"
+                                elif line.startswith("data: ") and event == "done":
+                                    ttft = json.loads(line[len("data: "):]).get("ttft_ms")
+                                    if ttft is not None:
+                                        first_token.append(ttft)
+                    else:
+                        r = await client.post("/ask", json={"q": q})
+                        errors += r.status_code != 200
+                except Exception:
+                    errors += 1
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+        qs = datasets.questions(scenario["requests"], scenario["rows"])
+        t0 = time.perf_counter()
+        await asyncio.gather(*(ask(q) for q in qs))
+        wall = time.perf_counter() - t0
+
+    return {
+        "ingest_s": round(ingest_s, 3),
+        "ingest_rows_per_sec": round(scenario["rows"] / ingest_s, 1) if ingest_s else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "ttft_p50_ms": percentile(first_token, 50) if first_token else None,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "errors": errors,
+        "rss_after_ingest_mb": rss_after_ingest,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def run_child(scenario: Dict, result_path: str) -> None:
+    """Runs inside the scenario interpreter: isolate state, patch clients, import the app, measure."""
+    import logging
+
+    workdir = Path(tempfile.mkdtemp(prefix="qa-bench-"))
+    os.environ.update({
+        "GOOGLE_API_KEY": "bench", "SUPABASE_URL": "http://bench.invalid", "SUPABASE_KEY": "bench",
+        "EMBEDDING_CACHE_PATH": str(workdir / ".embedding_cache.sqlite"),
+        "SALES_TABLE_PATH": str(workdir / ".sales_table.npy"),
+        "COORDINATION_PATH": str(workdir / ".coordination.sqlite"),
+        "LOCAL_INDEX_DIR": str(workdir / ".vector_index"),
+        "SLOW_QUERY_MS": os.environ.get("SLOW_QUERY_MS", "1e12"),
+    })
+    sys.path.insert(0, str(ROOT))
+    logging.disable(logging.WARNING)
+
+    from bench import fakes
+
+    fakes.install()
+    os.chdir(workdir)  # the app writes uploads under ./uploads
+    result = asyncio.run(_drive(scenario, workdir))
+    Path(result_path).write_text(json.dumps(result))
+
+def run_scenario(scenario: Dict, env: Dict[str, str]) -> Dict:
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as out:
+        result_path = out.name
+    cmd = [sys.executable, "-m", "bench.run", "--child", json.dumps(scenario), "--result", result_path]
+    proc = subprocess.run(cmd, cwd=ROOT, env={**os.environ, **env}, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{scenario_key(scenario)} failed:\n{proc.stderr[-4000:]}")
+    result = json.loads(Path(result_path).read_text())
+    os.unlink(result_path)
+    return result
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric, worse in COMPARED.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (worse == "higher" and change > tolerance) or (worse == "lower" and change < -tolerance):
+                regressions.append(f"{key}: {metric} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline latency/throughput/memory benchmark for the QA API.")
+    parser.add_argument("--rows", type=_ints, default=[1000, 10000], help="sales rows per scenario, e.g. 1000,1000000")
+    parser.add_argument("--faq-kb", type=_ints, default=[64], help="FAQ file sizes in KiB")
+    parser.add_argument("--concurrency", type=_ints, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="questions asked per scenario")
+    parser.add_argument("--endpoint", choices=["ask", "stream"], default="ask")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra app/fake settings, e.g. LOCAL_VECTOR_INDEX=1 or BENCH_LLM_LATENCY_MS=800")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before failing")
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(json.loads(args.child), args.result)
+        return 0
+
+    env = dict(item.split("=", 1) for item in args.env)
+    results: Dict[str, Dict] = {}
+    for rows in args.rows:
+        for faq_kb in args.faq_kb:
+            for concurrency in args.concurrency:
+                scenario = {"endpoint": args.endpoint, "rows": rows, "faq_kb": faq_kb,
+                            "concurrency": concurrency, "requests": args.requests}
+                key = scenario_key(scenario)
+                print(f"▶ {key} ...", flush=True)
+                results[key] = run_scenario(scenario, env)
+                r = results[key]
+                print(f"  ingest {r['ingest_s']}s ({r['ingest_rows_per_sec']} rows/s)  "
+                      f"p50 {r['p50_ms']}ms  p95 {r['p95_ms']}ms  p99 {r['p99_ms']}ms  "
+                      f"{r['throughput_rps']} req/s  errors {r['errors']}  peak RSS {r['peak_rss_mb']}MB", flush=True)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"Saved baseline for {len(results)} scenario(s) to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+        return 0
+
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    for line in regressions:
+        print(f"❌ {line}")
+    if not regressions:
+        print(f"✅ within {args.tolerance:.0%} of baseline")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from graph.deadline import within
+from graph.retrievals.label_router import normalize_question
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_MIN_SIMILARITY = float(os.environ.get("ANSWER_CACHE_MIN_SIMILARITY", "0.95"))
+
+NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+Key = Tuple[int, str]
+
+def _numbers(question: str) -> FrozenSet[str]:
+    # years/amounts a near-duplicate must share: "sales in 2023" and "sales in 2024" embed almost alike
+    return frozenset(NUMBER.findall(normalize_question(question)))
+
+class AnswerCache:
+    """Answers keyed by (dataset version, normalized question), with a cosine near-duplicate tier.
+
+    Entries expire after a TTL and are evicted LRU; concurrent identical misses share one computation.
+    Question vectors live in one preallocated matrix, one row (slot) per entry that has a vector.
+    """
+
+    def __init__(self, embeddings=None, max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+                 ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS, min_similarity: float = ANSWER_CACHE_MIN_SIMILARITY):
+        self._embeddings = embeddings
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._min_similarity = min_similarity
+        # key -> (expires_at, value, slot or None)
+        self._entries: "OrderedDict[Key, Tuple[float, Any, Optional[int]]]" = OrderedDict()
+        self._matrix: Optional[np.ndarray] = None  # (max_entries, dim), allocated on the first vector
+        self._slot_keys: List[Optional[Key]] = [None] * max_entries
+        self._slot_numbers: List[FrozenSet[str]] = [frozenset()] * max_entries
+        self._slot_versions = np.full(max_entries, -1, dtype=np.int64)  # -1 = free
+        self._free: List[int] = list(range(max_entries - 1, -1, -1))
+        self._inflight: Dict[Key, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"exact": 0, "semantic": 0, "coalesced": 0, "miss": 0, "semantic_skipped": 0}
+
+    def _vector(self, question: str) -> Optional[np.ndarray]:
+        if self._embeddings is None:
+            return None
+        try:
+            v = np.asarray(self._embeddings.embed_query(question), dtype=np.float32)
+        except Exception:
+            return None  # near-duplicate tier is best effort
+        return v / (np.linalg.norm(v) or 1.0)
+
+    def _lookup_exact(self, key: Key) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._release(self._entries.pop(key))
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _lookup_semantic(self, version: int, vec: Optional[np.ndarray], question: str) -> Optional[Any]:
+        if vec is None:
+            return None
+        numbers = _numbers(question)
+        now = time.monotonic()
+        with self._lock:
+            if self._matrix is None or self._matrix.shape[1] != vec.shape[0]:
+                return None
+            sims = self._matrix @ vec
+            sims[self._slot_versions != version] = -np.inf
+            above = np.flatnonzero(sims >= self._min_similarity)
+            for slot in above[np.argsort(-sims[above])]:
+                key = self._slot_keys[slot]
+                entry = self._entries.get(key)
+                if entry is None or entry[0] < now or self._slot_numbers[slot] != numbers:
+                    continue
+                self._entries.move_to_end(key)
+                return entry[1]
+            return None
+
+    def _release(self, entry: Tuple[float, Any, Optional[int]]) -> None:
+        slot = entry[2]
+        if slot is not None:
+            self._slot_keys[slot] = None
+            self._slot_versions[slot] = -1
+            self._free.append(slot)
+
+    def _store(self, key: Key, value: Any, vec: Optional[np.ndarray], question: str = "") -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._release(old)
+            while len(self._entries) >= self._max_entries:
+                self._release(self._entries.popitem(last=False)[1])
+            slot = None
+            if vec is not None:
+                if self._matrix is None or self._matrix.shape[1] != vec.shape[0]:
+                    self._matrix = np.zeros((self._max_entries, vec.shape[0]), dtype=np.float32)
+                slot = self._free.pop()
+                self._matrix[slot] = vec
+                self._slot_keys[slot] = key
+                self._slot_numbers[slot] = _numbers(question)
+                self._slot_versions[slot] = key[0]
+            self._entries[key] = (time.monotonic() + self._ttl, value, slot)
+
+    def peek(self, question: str, version: int) -> Optional[Any]:
+        return self._lookup_exact((version, normalize_question(question)))
+
+    def put(self, question: str, version: int, value: Any) -> None:
+        self._store((version, normalize_question(question)), value, None)
+
+    def get_or_compute_sync(self, question: str, version: int, compute: Callable[[], Any]) -> Tuple[Any, str]:
+        key = (version, normalize_question(question))
+        value = self._lookup_exact(key)
+        if value is not None:
+            self.stats["exact"] += 1
+            return value, "exact"
+        vec = self._vector(question)
+        value = self._lookup_semantic(version, vec, question)
+        if value is not None:
+            self.stats["semantic"] += 1
+            return value, "semantic"
+        self.stats["miss"] += 1
+        value = compute()
+        self._store(key, value, vec, question)
+        return value, "miss"
+
+    async def get_or_compute(self, question: str, version: int, compute: Callable[[], Awaitable[Any]],
+                             cacheable: Callable[[Any], bool] = lambda value: True,
+                             vector_timeout: Optional[float] = None) -> Tuple[Any, str]:
+        """Cached answer or compute(); values rejected by cacheable are returned but not stored.
+
+        The near-duplicate tier is skipped when embedding the question takes longer than vector_timeout.
+        """
+        key = (version, normalize_question(question))
+        value = self._lookup_exact(key)
+        if value is not None:
+            self.stats["exact"] += 1
+            return value, "exact"
+
+        while (pending := self._inflight.get(key)) is not None:
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending), "coalesced"
+            except asyncio.CancelledError:
+                # the leader's client went away: recompute (first waiter back leads) unless we were cancelled
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            vec = None
+            if self._embeddings is not None:
+                try:
+                    vec = await within(asyncio.to_thread(self._vector, question), vector_timeout)
+                except asyncio.TimeoutError:
+                    self.stats["semantic_skipped"] += 1
+            value = self._lookup_semantic(version, vec, question)
+            if value is not None:
+                self.stats["semantic"] += 1
+                future.set_result(value)
+                return value, "semantic"
+            self.stats["miss"] += 1
+            value = await compute()
+            if cacheable(value):
+                self._store(key, value, vec, question)
+            future.set_result(value)
+            return value, "miss"
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
@@ -0,0 +1,86 @@
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "1500"))  # per source
+
+# retriever artifact key -> section title, in rendering (and dedupe priority) order
+SOURCE_TITLES = {
+    "all_sales_retriever": "Sales (complete)",
+    "retrieval_sales": "Sales (sample matches)",
+    "retrieval_faq": "Policy/FAQ",
+}
+FIELD_LINE = re.compile(r"^\s*([A-Za-z_ ]+):\s*(.*)$")
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting
+    return len(text) // 4 + 1
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha1(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+def _as_record(text: str) -> Optional[Dict[str, str]]:
+    """Parse CSVLoader-style "Field: value" lines; None if the document is free text."""
+    record = {}
+    for line in text.strip().splitlines():
+        m = FIELD_LINE.match(line)
+        if not m:
+            return None
+        record[m.group(1).strip()] = m.group(2).strip()
+    return record or None
+
+def _render_section(docs: List[Document], budget: int) -> str:
+    records = [_as_record(d.page_content) for d in docs]
+    if records and all(records) and len({tuple(r) for r in records}) == 1:
+        header = list(records[0])
+        lines = [" | ".join(header)]
+        used = estimate_tokens(lines[0])
+        for r in records:
+            line = " | ".join(r[h] for h in header)
+            used += estimate_tokens(line)
+            if used > budget:
+                lines.append(f"... {len(records) - len(lines) + 1} more rows omitted")
+                break
+            lines.append(line)
+        return "\n".join(lines)
+
+    parts, used = [], 0
+    for i, d in enumerate(docs):
+        cost = estimate_tokens(d.page_content)
+        if used + cost > budget:
+            if not parts:
+                # a single oversized passage (e.g. a whole-table summary) is cut to the budget, at a line end
+                text = d.page_content[:budget * 4]
+                text = text[:text.rfind("\n")] if "\n" in text else text
+                parts.append(f"{text}\n... {len(d.page_content) - len(text)} more characters omitted")
+                i += 1
+            if i < len(docs):
+                parts.append(f"... {len(docs) - i} more passages omitted")
+            break
+        parts.append(d.page_content)
+        used += cost
+    return "\n\n".join(parts)
+
+def assemble_context(docs: List[Document], budget_per_source: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """Deduplicate, rank by retriever score and render each source compactly within its token budget."""
+    seen = set()
+    groups: Dict[str, List[Document]] = {}
+    ordered = sorted(docs, key=lambda d: list(SOURCE_TITLES).index(d.metadata.get("retriever"))
+                     if d.metadata.get("retriever") in SOURCE_TITLES else len(SOURCE_TITLES))
+    for d in ordered:
+        h = _content_hash(d.page_content)
+        if h in seen:
+            continue
+        seen.add(h)
+        groups.setdefault(d.metadata.get("retriever", "other"), []).append(d)
+
+    sections = []
+    for source, items in groups.items():
+        # stable sort keeps retriever order for documents without a score
+        items.sort(key=lambda d: -float(d.metadata.get("score", 0.0) or 0.0))
+        title = SOURCE_TITLES.get(source, "Other")
+        sections.append(f"{title}:\n{_render_section(items, budget_per_source)}")
+    return "\n\n".join(sections)
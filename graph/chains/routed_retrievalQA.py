@@ -1,36 +1,203 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains import RetrievalQA
-from langchain.retrievers import MergerRetriever
+from langchain_core.output_parsers import StrOutputParser
+import asyncio
+import time
 from dotenv import load_dotenv
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from graph.retrievals.label_router import normalize_question
+
+from graph.chains.answer_cache import AnswerCache
+from graph.chains.context import assemble_context, estimate_tokens
+from graph.deadline import ANSWER_TIMEOUT_MS, LOOKUP_SHARE, Deadline, within
+from graph.metrics import DOCUMENTS, PROMPT_TOKENS, annotate, span
+from graph.llm import get_chat_model
 
 load_dotenv()
 
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.0)
+EXCERPT_TOKEN_BUDGET = 300  # per source, for the answer returned when the LLM runs out of time
+
+def retrieval_qa_chain(prompt: ChatPromptTemplate, router, answer_cache: Optional[AnswerCache] = None, version: int = 0):
+    # Built once per chain version; the router does label picking and merging per query
+    answer_chain = prompt | get_chat_model() | StrOutputParser()
 
-def retrieval_qa_chain(prompt: ChatPromptTemplate, router):
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.0)
+    def prompt_inputs(query: str, docs) -> Dict:
+        with span("assemble_context"):
+            context = assemble_context(docs)
+        tokens = estimate_tokens(context) + estimate_tokens(query)
+        DOCUMENTS.observe(len(docs))
+        PROMPT_TOKENS.observe(tokens)
+        annotate(documents=len(docs), prompt_tokens=tokens)
+        return {"context": context, "question": query}
+
+    def excerpt(docs) -> str:
+        # cheap stand-in answer: the retrieved context itself, trimmed
+        return assemble_context(docs, EXCERPT_TOKEN_BUDGET) or "No answer within the time budget."
 
     def invoke(query: str):
-        chosen = router.pick_retrievers(query)
-        if not chosen:
-            raise RuntimeError("No retrievers available for the query. Check artifacts.")
-        retr = chosen if len(chosen) == 1 else MergerRetriever(retrievers=chosen)
-        qa = RetrievalQA.from_chain_type(
-            llm=llm,
-            retriever=retr,
-            chain_type="stuff",
-            chain_type_kwargs={"prompt": prompt},
-            return_source_documents=False,
-            verbose=False,
-        )
-        return qa.invoke({"query": query})
+        decision = router.route(query)
+        docs = router.retrieve(query, decision.label)
+        inputs = prompt_inputs(query, docs)
+        with span("answer_llm"):
+            result = answer_chain.invoke(inputs)
+        return {
+            "query": query,
+            "result": result,
+            "route": {"label": decision.label, "decided_by": decision.decided_by},
+        }
+
+    async def ainvoke(query: str, deadline: Optional[Deadline] = None):
+        deadline = deadline or Deadline()
+        decision = await router.aroute(query, deadline)
+        docs = await router.aretrieve(query, decision.label, deadline=deadline)
+        inputs = prompt_inputs(query, docs)
+        with span("answer_llm"):
+            try:
+                result = await within(answer_chain.ainvoke(inputs), deadline.timeout(ANSWER_TIMEOUT_MS))
+            except asyncio.TimeoutError:
+                deadline.degrade("answer_llm", "timeout", "context_excerpt")
+                result = excerpt(docs)
+        return {
+            "query": query,
+            "result": result,
+            "route": {"label": decision.label, "decided_by": decision.decided_by},
+            "degraded": deadline.degraded,
+        }
+
+    async def astream(query: str, deadline: Optional[Deadline] = None) -> AsyncIterator[Tuple[str, Dict]]:
+        deadline = deadline or Deadline()
+        start = time.perf_counter()
+        cached = answer_cache.peek(query, version) if answer_cache is not None else None
+        if cached is not None:
+            yield "route", {**cached["route"], "cache": "exact"}
+            yield "token", {"text": cached["result"]}
+            total_ms = (time.perf_counter() - start) * 1000
+            yield "done", {"ttft_ms": total_ms, "total_ms": total_ms, "degraded": []}
+            return
+
+        decision = await router.aroute(query, deadline)
+        route = {"label": decision.label, "decided_by": decision.decided_by}
+        yield "route", route
+        docs = await router.aretrieve(query, decision.label, deadline=deadline)
+        yield "sources", {"count": len(docs)}
+
+        parts, ttft_ms = [], None
+        inputs = prompt_inputs(query, docs)
+        answer_timeout = deadline.timeout(ANSWER_TIMEOUT_MS)
+        stop_at = time.perf_counter() + answer_timeout if answer_timeout is not None else None
+        stream = answer_chain.astream(inputs)
+        with span("answer_llm"):
+            try:
+                while True:
+                    left = stop_at - time.perf_counter() if stop_at is not None else None
+                    try:
+                        chunk = await within(stream.__anext__(), left)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        deadline.degrade("answer_llm", "timeout", "partial" if parts else "context_excerpt")
+                        break
+                    if not chunk:
+                        continue
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - start) * 1000
+                    parts.append(chunk)
+                    yield "token", {"text": chunk}
+            finally:
+                await stream.aclose()
+        if not parts and deadline.degraded:
+            ttft_ms = (time.perf_counter() - start) * 1000
+            yield "token", {"text": excerpt(docs)}
+        # degraded answers are not cached: the next request may well have the time for a full one
+        if answer_cache is not None and not deadline.degraded:
+            answer_cache.put(query, version, {"query": query, "result": "".join(parts), "route": route})
+        yield "done", {"ttft_ms": ttft_ms, "total_ms": (time.perf_counter() - start) * 1000,
+                       "degraded": deadline.degraded}
+
+    async def abatch(queries: List[str], max_concurrency: int = 8) -> List[Dict]:
+        # dedupe -> route all -> group by label -> shared retrieval per group -> bounded answering
+        unique: Dict[str, str] = {}
+        for q in queries:
+            unique.setdefault(normalize_question(q), q)
+        outputs: Dict[str, Dict] = {}
+        pending: List[str] = []
+        for key, q in unique.items():
+            cached = answer_cache.peek(q, version) if answer_cache is not None else None
+            if cached is not None:
+                outputs[key] = {**cached, "query": q, "cache": "exact"}
+            else:
+                pending.append(q)
+
+        sem = asyncio.Semaphore(max_concurrency)
+
+        async def route(q: str):
+            # low-confidence questions call the router LLM; keep those within max_concurrency too
+            async with sem:
+                return await router.aroute(q)
+
+        decisions = await asyncio.gather(*(route(q) for q in pending))
+        groups: Dict[str, List[Tuple[str, object]]] = {}
+        for q, d in zip(pending, decisions):
+            groups.setdefault(d.label, []).append((q, d))
+
+        async def answer(q: str, decision, docs) -> Dict:
+            route = {"label": decision.label, "decided_by": decision.decided_by}
+            if isinstance(docs, Exception):
+                return {"query": q, "route": route, "error": str(docs)}
+            async with sem:
+                try:
+                    inputs = prompt_inputs(q, docs)
+                    with span("answer_llm"):
+                        result = await answer_chain.ainvoke(inputs)
+                except Exception as e:
+                    return {"query": q, "route": route, "error": str(e)}
+            output = {"query": q, "result": result, "route": route}
+            if answer_cache is not None:
+                answer_cache.put(q, version, output)
+            return {**output, "cache": "miss"}
+
+        async def run_group(label: str, items) -> None:
+            group_queries = [q for q, _ in items]
+            try:
+                docs_list = await router.aretrieve_many(group_queries, label, max_concurrency)
+            except Exception as e:
+                docs_list = [e] * len(items)
+            answered = await asyncio.gather(*(answer(q, d, docs) for (q, d), docs in zip(items, docs_list)))
+            for out in answered:
+                outputs[normalize_question(out["query"])] = out
+
+        await asyncio.gather(*(run_group(label, items) for label, items in groups.items()))
+        return [{**outputs[normalize_question(q)], "query": q} for q in queries]
+
+    def cacheable(output: Dict) -> bool:
+        return not output.get("degraded")
 
     class OnDemandQA:
         def invoke(self, x):
             # x may be a dict or a str depending on caller
             query = x if isinstance(x, str) else x.get("query", x)
-            return invoke(query)
+            if answer_cache is None:
+                return invoke(query)
+            output, hit = answer_cache.get_or_compute_sync(query, version, lambda: invoke(query))
+            return {**output, "query": query, "cache": hit}
 
-    return OnDemandQA()
+        async def ainvoke(self, x):
+            # x may carry a latency budget: {"query": ..., "budget_ms": ...}
+            query = x if isinstance(x, str) else x.get("query", x)
+            deadline = Deadline(None if isinstance(x, str) else x.get("budget_ms"))
+            if answer_cache is None:
+                return await ainvoke(query, deadline)
+            # a cached answer is the cheapest path of all, so the cache is consulted before any stage
+            output, hit = await answer_cache.get_or_compute(query, version, lambda: ainvoke(query, deadline),
+                                                            cacheable=cacheable,
+                                                            vector_timeout=deadline.timeout(share=LOOKUP_SHARE))
+            return {**output, "query": query, "cache": hit}
+
+        async def abatch(self, queries: List[str], max_concurrency: int = 8) -> List[Dict]:
+            return await abatch(queries, max_concurrency)
 
+        def astream(self, x):
+            query = x if isinstance(x, str) else x.get("query", x)
+            return astream(query, Deadline(None if isinstance(x, str) else x.get("budget_ms")))
+
+    return OnDemandQA()
@@ -0,0 +1,217 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from graph.datasets import DEFAULT_DATASET
+
+COORDINATION_PATH = os.environ.get("COORDINATION_PATH", "./uploads/.coordination.sqlite")
+LEASE_SECONDS = float(os.environ.get("INGEST_LEASE_SECONDS", "30"))
+VERSION_POLL_SECONDS = float(os.environ.get("DATASET_POLL_SECONDS", "0.5"))
+JOB_RETENTION_SECONDS = 24 * 3600
+
+class Coordinator:
+    """Dataset state shared by every worker process on the host through one SQLite file (WAL).
+
+    Holds the active files and data version per dataset, a lease electing the single worker
+    allowed to ingest a dataset, and snapshots of ingestion jobs so any worker can report them.
+    """
+
+    def __init__(self, path: str = COORDINATION_PATH, lease_seconds: float = LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._versions: Dict[str, tuple] = {}  # name -> (read_at, version)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # autocommit; lease changes take an explicit BEGIN IMMEDIATE write lock
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS datasets ("
+            "name TEXT PRIMARY KEY, csv_path TEXT, txt_path TEXT, "
+            "version INTEGER NOT NULL DEFAULT 0, populated INTEGER, updated_at REAL NOT NULL)"
+        )
+        try:
+            self._conn.execute("ALTER TABLE datasets ADD COLUMN populated INTEGER")
+        except sqlite3.OperationalError:
+            pass  # column already there
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, dataset TEXT NOT NULL, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, path TEXT, updated_at REAL NOT NULL)"
+        )
+
+    def dataset(self, name: str = DEFAULT_DATASET) -> Dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT csv_path, txt_path, version, populated FROM datasets WHERE name = ?", (name,)
+            ).fetchone()
+        csv_path, txt_path, version, populated = row or (None, None, 0, None)
+        return {"name": name, "csv_path": csv_path, "txt_path": txt_path, "version": version,
+                "populated": None if populated is None else bool(populated)}
+
+    def datasets(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT name FROM datasets ORDER BY name")]
+
+    def set_files(self, name: str = DEFAULT_DATASET, csv_path: Optional[str] = None,
+                  txt_path: Optional[str] = None) -> Dict:
+        """Record newly uploaded files; a None path keeps the dataset's current one."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO datasets (name, csv_path, txt_path, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET csv_path = COALESCE(excluded.csv_path, csv_path), "
+                "txt_path = COALESCE(excluded.txt_path, txt_path), updated_at = excluded.updated_at",
+                (name, csv_path, txt_path, time.time()),
+            )
+        return self.dataset(name)
+
+    def populated(self, name: str = DEFAULT_DATASET) -> Optional[bool]:
+        """Whether both stores hold rows for the dataset, as recorded by the last ingest (None = unknown)."""
+        return self.dataset(name)["populated"]
+
+    def set_populated(self, name: str, populated: bool) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO datasets (name, populated, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET populated = excluded.populated, updated_at = excluded.updated_at",
+                (name, int(populated), time.time()),
+            )
+
+    def version(self, name: str = DEFAULT_DATASET) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM datasets WHERE name = ?", (name,)).fetchone()
+        version = row[0] if row else 0
+        self._versions[name] = (time.monotonic(), version)
+        return version
+
+    def cached_version(self, name: str = DEFAULT_DATASET, max_age: float = VERSION_POLL_SECONDS) -> int:
+        # hot path (every /ask): hit the database at most once per max_age seconds
+        read_at, version = self._versions.get(name, (float("-inf"), 0))
+        if time.monotonic() - read_at < max_age:
+            return version
+        return self.version(name)
+
+    def bump_version(self, name: str = DEFAULT_DATASET) -> int:
+        """Announce that the stored data changed; other workers rebuild their chains on seeing it."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO datasets (name, version, updated_at) VALUES (?, 1, ?) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at",
+                (name, time.time()),
+            )
+        return self.version(name)
+
+    def fingerprint(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT fingerprint FROM fingerprints WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_fingerprint(self, key: str, fingerprint: str, path: Optional[str] = None) -> None:
+        # one row per table@dataset: concurrent ingests of different datasets never touch each other's entry
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (key, fingerprint, path, updated_at) VALUES (?, ?, ?, ?)",
+                (key, fingerprint, path, time.time()),
+            )
+
+    def try_acquire(self, name: str = DEFAULT_DATASET) -> bool:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+                if row is not None and row[0] != self.owner and row[1] > now:
+                    self._conn.execute("ROLLBACK")
+                    return False
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)",
+                    (name, self.owner, now + self.lease_seconds),
+                )
+                self._conn.execute("COMMIT")
+                return True
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def renew(self, name: str = DEFAULT_DATASET) -> bool:
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE leases SET expires_at = ? WHERE name = ? AND owner = ?",
+                (time.time() + self.lease_seconds, name, self.owner),
+            )
+        return cur.rowcount == 1
+
+    def release(self, name: str = DEFAULT_DATASET) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
+
+    def leader(self, name: str = DEFAULT_DATASET) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT owner FROM leases WHERE name = ? AND expires_at > ?", (name, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    @contextmanager
+    def leadership(self, name: str = DEFAULT_DATASET, on_wait: Optional[Callable[[], None]] = None,
+                   poll: float = 0.25) -> Iterator[None]:
+        """Block until this worker holds the dataset's ingestion lease; renew it while the body runs.
+
+        A worker that dies mid-ingest stops renewing, so its lease lapses after lease_seconds.
+        """
+        while not self.try_acquire(name):
+            if on_wait is not None:
+                on_wait()
+            time.sleep(poll)
+        stop = threading.Event()
+
+        def heartbeat() -> None:
+            while not stop.wait(self.lease_seconds / 3):
+                self.renew(name)
+
+        beat = threading.Thread(target=heartbeat, name=f"lease-{name}", daemon=True)
+        beat.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            beat.join()
+            self.release(name)
+
+    def save_job(self, job_id: str, state: Dict, dataset: str = DEFAULT_DATASET) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, dataset, state, updated_at) VALUES (?, ?, ?, ?)",
+                (job_id, dataset, json.dumps(state), now),
+            )
+            if state.get("stage") in ("done", "failed"):
+                self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (now - JOB_RETENTION_SECONDS,))
+
+    def job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+_coordinator: Optional[Coordinator] = None
+_coordinator_lock = threading.Lock()
+
+def get_coordinator() -> Coordinator:
+    global _coordinator
+    with _coordinator_lock:
+        if _coordinator is None:
+            _coordinator = Coordinator()
+        return _coordinator
@@ -0,0 +1,18 @@
+from pathlib import Path
+from typing import Dict
+
+DEFAULT_DATASET = "default"
+# no dots or slashes: names end up in file names and upload directories
+DATASET_PATTERN = r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$"
+
+def dataset_filter(dataset: str) -> Dict[str, str]:
+    """Metadata every stored row carries; vector and scan queries match on it."""
+    return {"dataset": dataset}
+
+def dataset_key(name: str, dataset: str) -> str:
+    # the default dataset keeps the pre-namespace keys so existing fingerprints and snapshots stay valid
+    return name if dataset == DEFAULT_DATASET else f"{name}@{dataset}"
+
+def dataset_path(base: Path, dataset: str) -> Path:
+    """Per-dataset variant of a local artifact path (.sales_table.npy -> .sales_table.<dataset>.npy)."""
+    return base if dataset == DEFAULT_DATASET else base.with_name(f"{base.stem}.{dataset}{base.suffix}")
@@ -0,0 +1,50 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Dict, List, Optional, TypeVar
+
+from graph.metrics import annotate
+
+T = TypeVar("T")
+
+# per-stage caps, applied with or without a request budget (0 = no cap of its own)
+ROUTER_TIMEOUT_MS = float(os.environ.get("ROUTER_TIMEOUT_MS", "2500"))
+RETRIEVER_TIMEOUT_MS = float(os.environ.get("RETRIEVER_TIMEOUT_MS", "8000"))
+ANSWER_TIMEOUT_MS = float(os.environ.get("ANSWER_TIMEOUT_MS", "0"))
+# share of the remaining budget routing / retrieval may spend; the answer LLM gets what is left
+LOOKUP_SHARE = 0.1  # embedding the question for the near-duplicate answer cache
+ROUTE_SHARE = 0.2
+RETRIEVE_SHARE = 0.4
+
+class Deadline:
+    """Latency budget of one request: per-stage timeouts plus a record of the stages that degraded."""
+
+    def __init__(self, budget_ms: Optional[float] = None):
+        self.budget_ms = budget_ms
+        self._expires_at = time.perf_counter() + budget_ms / 1000 if budget_ms else None
+        self.degraded: List[Dict[str, str]] = []
+
+    def remaining(self) -> Optional[float]:
+        if self._expires_at is None:
+            return None
+        return max(0.0, self._expires_at - time.perf_counter())
+
+    def timeout(self, cap_ms: float = 0.0, share: float = 1.0) -> Optional[float]:
+        """Seconds the next stage may take: its cap, shrunk to a share of the remaining budget."""
+        cap = cap_ms / 1000 if cap_ms > 0 else None
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return remaining * share if cap is None else min(cap, remaining * share)
+
+    def degrade(self, stage: str, reason: str, fallback: str) -> None:
+        self.degraded.append({"stage": stage, "reason": reason, "fallback": fallback})
+        annotate(degraded=",".join(d["stage"] for d in self.degraded))
+
+async def within(awaitable: Awaitable[T], timeout: Optional[float]) -> T:
+    """Await with an optional timeout; an exhausted budget times out without starting the work."""
+    if timeout is not None and timeout <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise asyncio.TimeoutError
+    return await asyncio.wait_for(awaitable, timeout)
@@ -0,0 +1,101 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from graph.datasets import DEFAULT_DATASET
+
+PUBLISH_INTERVAL = 0.5  # seconds between progress snapshots pushed to on_update
+
+@dataclass
+class IngestJob:
+    id: str
+    files: List[str]
+    dataset: str = DEFAULT_DATASET
+    stage: str = "queued"  # queued | waiting | loading | diffing | splitting | embedding | inserting | done | failed
+    done: int = 0
+    total: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stage_started_at: Optional[float] = None
+    items_per_sec: Optional[float] = None
+    result: Dict = field(default_factory=dict)
+    error: Optional[str] = None
+    on_update: Optional[Callable[["IngestJob"], None]] = field(default=None, repr=False, compare=False)
+    published_at: float = field(default=0.0, repr=False, compare=False)
+
+    def progress(self, stage: str, done: int = 0, total: int = 0) -> None:
+        now = time.time()
+        if stage != self.stage:
+            self.stage_started_at = now
+        elif done and now > self.stage_started_at:
+            self.items_per_sec = round(done / (now - self.stage_started_at), 2)
+        changed = stage != self.stage
+        self.stage, self.done, self.total = stage, done, total
+        if self.on_update is not None and (changed or now - self.published_at >= PUBLISH_INTERVAL):
+            self.published_at = now
+            self.on_update(self)
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in ("done", "failed")
+
+    def to_dict(self) -> Dict:
+        now = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "dataset": self.dataset,
+            "files": self.files,
+            "stage": self.stage,
+            "progress": {"done": self.done, "total": self.total},
+            "items_per_sec": self.items_per_sec,
+            "elapsed_s": round(now - self.started_at, 3) if self.started_at else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+class IngestJobQueue:
+    """Bounded worker pool running ingestion jobs off the request path."""
+
+    def __init__(self, runner: Callable[[IngestJob], Dict], max_workers: int = 1, keep: int = 200,
+                 on_update: Optional[Callable[[IngestJob], None]] = None):
+        self._runner = runner
+        self._on_update = on_update
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: Dict[str, IngestJob] = {}
+        self._keep = keep
+        self._lock = threading.Lock()
+
+    def submit(self, files: List[str], dataset: str = DEFAULT_DATASET) -> IngestJob:
+        job = IngestJob(id=uuid.uuid4().hex, files=files, dataset=dataset, on_update=self._on_update)
+        if self._on_update is not None:
+            self._on_update(job)
+        with self._lock:
+            self._jobs[job.id] = job
+            for old in [j for j in self._jobs.values() if j.finished][: max(0, len(self._jobs) - self._keep)]:
+                self._jobs.pop(old.id, None)
+        self._pool.submit(self._run, job)
+        return job
+
+    def _run(self, job: IngestJob) -> None:
+        job.started_at = time.time()
+        try:
+            job.result = self._runner(job) or {}
+            stage = "done"
+        except Exception as e:
+            job.error = str(e)
+            stage = "failed"
+        job.finished_at = time.time()
+        job.progress(stage, job.done, job.total)
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def pending(self, dataset: Optional[str] = None) -> int:
+        return sum(1 for j in list(self._jobs.values()) if not j.finished and dataset in (None, j.dataset))
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
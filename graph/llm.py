@@ -0,0 +1,18 @@
+import threading
+from typing import Any, Optional
+
+CHAT_MODEL = "gemini-2.5-flash"
+
+_chat_model: Optional[Any] = None
+_chat_model_lock = threading.Lock()
+
+def get_chat_model():
+    """Process-wide chat model shared by the router and answer chains, created on first use."""
+    global _chat_model
+    with _chat_model_lock:
+        if _chat_model is None:
+            # langchain_google_genai pulls in the generated Gemini client; keep it off the import path
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            _chat_model = ChatGoogleGenerativeAI(model=CHAT_MODEL, temperature=0.0)
+        return _chat_model
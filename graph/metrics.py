@@ -0,0 +1,97 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "3000"))
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series: Dict[LabelKey, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        for key, series in items:
+            base = ",".join(f'{k}="{v}"' for k, v in key)
+            sep = "," if base else ""
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-1]}')
+            plain = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{plain} {series[-2]}")
+            lines.append(f"{self.name}_count{plain} {series[-1]}")
+        return "\n".join(lines)
+
+STAGE_SECONDS = Histogram("qa_stage_seconds", "Time spent per pipeline stage.", LATENCY_BUCKETS)
+REQUEST_SECONDS = Histogram("qa_request_seconds", "HTTP request latency.", LATENCY_BUCKETS)
+DOCUMENTS = Histogram("qa_retrieved_documents", "Documents retrieved per question.", SIZE_BUCKETS)
+PROMPT_TOKENS = Histogram("qa_prompt_tokens", "Estimated prompt tokens per answer call.", SIZE_BUCKETS)
+INGEST_ROWS = Histogram("qa_ingest_batch_rows", "Rows per embed/insert batch during ingestion.", SIZE_BUCKETS)
+ALL_METRICS = (STAGE_SECONDS, REQUEST_SECONDS, DOCUMENTS, PROMPT_TOKENS, INGEST_ROWS)
+
+# per-request breakdown: stage -> ms plus attributes such as label/documents/prompt_tokens
+_trace: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("qa_trace", default=None)
+
+def start_trace() -> Dict:
+    trace: Dict = {"stages": {}}
+    _trace.set(trace)
+    return trace
+
+def annotate(**attrs) -> None:
+    trace = _trace.get()
+    if trace is not None:
+        trace.update(attrs)
+
+@contextmanager
+def span(stage: str, **labels: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage, **labels)
+        trace = _trace.get()
+        if trace is not None:
+            name = stage if not labels else f"{stage}[{','.join(labels.values())}]"
+            trace["stages"][name] = round(trace["stages"].get(name, 0.0) + elapsed * 1000, 2)
+
+def defer_trace() -> Optional[Dict]:
+    """Hand the current trace to a streaming body, which finishes it after the last chunk."""
+    trace = _trace.get()
+    if trace is not None:
+        trace["deferred"] = True
+    return trace
+
+def finish_trace(trace: Dict, method: str, path: str, status: int, elapsed: float) -> None:
+    trace.pop("deferred", None)
+    REQUEST_SECONDS.observe(elapsed, method=method, path=path, status=str(status))
+    if elapsed * 1000 >= SLOW_QUERY_MS and trace["stages"]:
+        logger.warning(f"🐢 Slow {method} {path} {elapsed * 1000:.0f}ms breakdown={trace}")
+
+def render_prometheus() -> str:
+    return "\n".join(m.render() for m in ALL_METRICS) + "\n"
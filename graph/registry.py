@@ -0,0 +1,52 @@
+import logging
+import threading
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ChainRegistry:
+    """Holds the long-lived QA chain; a rebuild swaps in a new (version, chain) pair at once."""
+
+    def __init__(self, builder: Callable[[int], Any]):
+        self._builder = builder
+        self._build_lock = threading.Lock()
+        self._current: Tuple[int, Optional[Any]] = (0, None)
+        self.data_version = 0  # shared dataset version the current chain was built from
+        self._refreshing = False
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._current[0]
+
+    def current(self) -> Optional[Any]:
+        return self._current[1]
+
+    def rebuild(self, data_version: Optional[int] = None) -> int:
+        # Build outside the swap so in-flight requests keep using the old chain
+        with self._build_lock:
+            version = self._current[0] + 1
+            chain = self._builder(version)
+            self._current = (version, chain)
+            if data_version is not None:
+                self.data_version = max(self.data_version, data_version)
+            return version
+
+    def refresh_in_background(self, data_version: int) -> bool:
+        """Rebuild on a thread (one at a time) when another worker published newer data."""
+        with self._refresh_lock:
+            if data_version <= self.data_version or self._refreshing:
+                return False
+            self._refreshing = True
+
+        def run() -> None:
+            try:
+                self.rebuild(data_version)
+                logger.info(f"🔄 Chain rebuilt for shared dataset v{data_version}")
+            except Exception:
+                logger.exception(f"Chain rebuild for dataset v{data_version} failed")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="chain-refresh", daemon=True).start()
+        return True
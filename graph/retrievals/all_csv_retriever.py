@@ -1,39 +1,173 @@
-from typing import List
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import ClassVar, Dict, Iterator, List, Optional, Tuple
 from langchain_core.documents import Document
-from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
 from langchain_core.retrievers import BaseRetriever
 from pydantic import PrivateAttr
 
+from graph.datasets import DEFAULT_DATASET, dataset_key
+from graph.metrics import span
+from graph.retrievals.fingerprint import stored_fingerprint
+
 SALES_TABLE = "sales_collection"
+PAGE_SIZE = 1000  # PostgREST default max-rows
+MAX_PARALLEL_PAGES = 8
+# rows with no recorded fingerprint (migrated or ingested elsewhere) are re-paged at most this often
+SNAPSHOT_TTL_SECONDS = float(os.environ.get("SNAPSHOT_TTL_SECONDS", "300"))
+
+Row = Tuple[str, Dict]
 
 class AllCSVRetriever(BaseRetriever):
+    # result does not depend on the query, so batch callers fetch it once per group
+    shared_across_queries: ClassVar[bool] = True
     _supabase_client: any = PrivateAttr(default=None)
+    _async_client: any = PrivateAttr(default=None)
+    _page_size: int = PrivateAttr(default=PAGE_SIZE)
+    _max_workers: int = PrivateAttr(default=MAX_PARALLEL_PAGES)
+    _dataset: str = PrivateAttr(default=DEFAULT_DATASET)
+    # (data version, contents, metadatas) kept as plain tuples rather than Documents
+    _snapshot: Optional[Tuple[Optional[str], Tuple[str, ...], Tuple[Dict, ...]]] = PrivateAttr(default=None)
+    _snapshot_at: float = PrivateAttr(default=0.0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _inflight: Optional[Tuple[Optional[str], asyncio.Task]] = PrivateAttr(default=None)
 
-    def __init__(self, supabase_client, **data):
+    def __init__(self, supabase_client, page_size: int = PAGE_SIZE, max_workers: int = MAX_PARALLEL_PAGES,
+                 async_client=None, dataset: str = DEFAULT_DATASET, **data):
         super().__init__(**data)
+        self._dataset = dataset
         self._supabase_client = supabase_client
+        self._async_client = async_client
+        self._page_size = page_size
+        self._max_workers = max_workers
+
+    def _page_query(self, client, start: int, with_count: bool):
+        query = client.table(SALES_TABLE)
+        query = query.select("content, metadata", count="exact") if with_count else query.select("content, metadata")
+        return query.eq("metadata->>dataset", self._dataset).order("id").range(start, start + self._page_size - 1)
+
+    @property
+    def _version_key(self) -> str:
+        return dataset_key(SALES_TABLE, self._dataset)
+
+    def _fetch_page(self, start: int, with_count: bool = False):
+        return self._page_query(self._supabase_client, start, with_count).execute()
+
+    async def _afetch_page(self, start: int, with_count: bool = False):
+        return await self._page_query(self._async_client, start, with_count).execute()
+
+    @staticmethod
+    def _rows(resp) -> List[Row]:
+        return [(r.get("content", "") or "", r.get("metadata") or {}) for r in (getattr(resp, "data", None) or [])]
+
+    def fetch_all(self) -> List[Row]:
+        """First page returns the row count; remaining pages are fetched concurrently."""
+        first = self._fetch_page(0, with_count=True)
+        rows = self._rows(first)
+        total = getattr(first, "count", None)
+        if total is None:
+            # count unavailable: fall back to sequential paging
+            for page in self._iter_pages(len(rows), len(rows) == self._page_size):
+                rows.extend(page)
+            return rows
+        starts = list(range(self._page_size, total, self._page_size))
+        if starts:
+            with ThreadPoolExecutor(max_workers=min(self._max_workers, len(starts))) as pool:
+                for resp in pool.map(self._fetch_page, starts):
+                    rows.extend(self._rows(resp))
+        return rows
+
+    async def afetch_all(self) -> List[Row]:
+        first = await self._afetch_page(0, with_count=True)
+        rows = self._rows(first)
+        total = getattr(first, "count", None)
+        if total is None:
+            return await asyncio.to_thread(self.fetch_all)
+        sem = asyncio.Semaphore(self._max_workers)
+
+        async def page(start: int) -> List[Row]:
+            async with sem:
+                return self._rows(await self._afetch_page(start))
+
+        for part in await asyncio.gather(*(page(s) for s in range(self._page_size, total, self._page_size))):
+            rows.extend(part)
+        return rows
+
+    def _iter_pages(self, start: int = 0, more: bool = True) -> Iterator[List[Row]]:
+        while more:
+            page = self._rows(self._fetch_page(start))
+            if page:
+                yield page
+            more = len(page) == self._page_size
+            start += self._page_size
+
+    def _fresh(self, snap, version: Optional[str]) -> bool:
+        if snap is None or snap[0] != version:
+            return False
+        # without a version marker, fall back to a TTL
+        return version is not None or time.monotonic() - self._snapshot_at < SNAPSHOT_TTL_SECONDS
+
+    def _keep(self, version: Optional[str], rows: List[Row]):
+        snap = (version, tuple(c for c, _ in rows), tuple(m for _, m in rows))
+        self._snapshot, self._snapshot_at = snap, time.monotonic()
+        return snap
+
+    def snapshot(self) -> Tuple[Tuple[str, ...], Tuple[Dict, ...]]:
+        """Rows cached locally until the ingest data-version marker changes (or the TTL lapses without one)."""
+        version = stored_fingerprint(self._version_key)
+        snap = self._snapshot
+        if self._fresh(snap, version):
+            return snap[1], snap[2]
+        with self._lock:
+            snap = self._snapshot
+            if not self._fresh(snap, version):
+                with span("supabase_paging"):
+                    snap = self._keep(version, self.fetch_all())
+        return snap[1], snap[2]
+
+    async def asnapshot(self) -> Tuple[Tuple[str, ...], Tuple[Dict, ...]]:
+        version = stored_fingerprint(self._version_key)
+        snap = self._snapshot
+        if self._fresh(snap, version):
+            return snap[1], snap[2]
+        # concurrent cold requests share one paging task; shielded so a caller timing out doesn't cancel it
+        inflight = self._inflight
+        if inflight is None or inflight[0] != version or inflight[1].done():
+            inflight = (version, asyncio.ensure_future(self._arefresh(version)))
+            self._inflight = inflight
+        snap = await asyncio.shield(inflight[1])
+        return snap[1], snap[2]
+
+    async def _arefresh(self, version: Optional[str]) -> Tuple[Optional[str], Tuple[str, ...], Tuple[Dict, ...]]:
+        with span("supabase_paging"):
+            return self._keep(version, await self.afetch_all())
+
+    def iter_rows(self) -> Iterator[Row]:
+        """Stream rows page by page without materializing the whole table (uses the snapshot if fresh)."""
+        snap = self._snapshot
+        if self._fresh(snap, stored_fingerprint(self._version_key)):
+            yield from zip(snap[1], snap[2])
+            return
+        for page in self._iter_pages():
+            yield from page
+
+    def iter_documents(self) -> Iterator[Document]:
+        for content, metadata in self.iter_rows():
+            yield Document(page_content=content, metadata=metadata)
 
     def _get_relevant_documents(
         self, query: str, *, run_manager: CallbackManagerForRetrieverRun
     ) -> List[Document]:
-        client = self._supabase_client
-        page_size = 100
-        docs_all: List[Document] = []
-        start = 0
-        while True:
-            end = start + page_size - 1
-            resp = client.table(SALES_TABLE).select("content, metadata").range(start, end).execute()
-            rows = getattr(resp, "data", None) or []
-            if not rows:
-                break
-            for r in rows:
-                docs_all.append(
-                    Document(
-                        page_content=r.get("content", "") or "",
-                        metadata=r.get("metadata") or {}
-                    )
-                )
-            if len(rows) < page_size:
-                break
-            start += page_size
-        return docs_all
+        contents, metadatas = self.snapshot()
+        return [Document(page_content=c, metadata=m) for c, m in zip(contents, metadatas)]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if self._async_client is None:
+            return await super()._aget_relevant_documents(query, run_manager=run_manager)
+        contents, metadatas = await self.asnapshot()
+        return [Document(page_content=c, metadata=m) for c, m in zip(contents, metadatas)]
@@ -0,0 +1,270 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import uuid
+from itertools import chain, islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from graph.datasets import DEFAULT_DATASET, dataset_key, dataset_path
+from graph.retrievals.fingerprint import file_fingerprint, stored_fingerprint, record_fingerprint
+from graph.retrievals.embedding_cache import EMBEDDING_MODEL, get_embeddings
+from graph.retrievals.sales_table import SALES_TABLE_PATH, SalesTable, SalesTableBuilder, build_sales_table
+from graph.retrievals.loaders import FIELDS, count_data_lines, iter_faq_documents, iter_sales_documents
+from graph.retrievals.ingest_pipeline import IngestPipeline, last_run_stats
+from graph.retrievals.hybrid import FAQ_INDEX_PATH, BM25Index, BM25IndexBuilder, HybridRetriever, SalesLexicalIndex
+
+SALES_TABLE = "sales_collection"
+FAQ_TABLE = "faq_collection"
+
+SALES_LOADER_SETTINGS = {
+    "loader": "stream-v1",  # header detected per file; typed Month/Year/Total_Sales/Transactions
+    "fields": FIELDS,
+    "encoding": "utf-8",
+}
+FAQ_SPLITTER_SETTINGS = {"chunk_size": 400, "chunk_overlap": 70}
+ROW_ID_NAMESPACE = uuid.UUID("5b0c6f4e-8f1d-4a57-9d8e-2c1f3b7a6e90")
+DIFF_BATCH = 500  # rows whose ids are checked against the store per query
+HYBRID_RETRIEVAL = os.environ.get("HYBRID_RETRIEVAL", "1") == "1"
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "supabase")  # supabase | chroma
+
+Progress = Callable[..., None]
+
+def _no_progress(stage: str, done: int = 0, total: int = 0) -> None:
+    pass
+
+def sales_fingerprint(csv_path: str) -> str:
+    return file_fingerprint(csv_path, {"loader": SALES_LOADER_SETTINGS, "model": EMBEDDING_MODEL})
+
+def faq_fingerprint(txt_path: str) -> str:
+    return file_fingerprint(txt_path, {"splitter": FAQ_SPLITTER_SETTINGS, "model": EMBEDDING_MODEL})
+
+def build_faq_index(txt_path: str, path: Path = FAQ_INDEX_PATH) -> BM25Index:
+    lexical = BM25IndexBuilder(path)
+    for _ in iter_faq_documents(txt_path, encoding="utf-8", on_chunk=lexical.add, **FAQ_SPLITTER_SETTINGS):
+        pass
+    return lexical.build()
+
+def content_hash(doc: Document) -> str:
+    """Identity of a row/chunk: its text only, so inserting a row or renaming the file moves nothing else."""
+    return hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+
+def row_id(dataset: str, digest: str, occurrence: int = 0) -> str:
+    # deterministic, so an unchanged row maps to the id it was stored under last time
+    return str(uuid.uuid5(ROW_ID_NAMESPACE, f"{dataset}/{digest}/{occurrence}"))
+
+class _StagedIds:
+    """Row ids of one sync in a private temporary SQLite database (spills to disk), not Python sets."""
+
+    def __init__(self):
+        self._conn = sqlite3.connect("", check_same_thread=False)  # "" = anonymous on-disk temp database
+        self._conn.execute("CREATE TABLE wanted (id TEXT PRIMARY KEY)")
+        self._conn.execute("CREATE TABLE removed (id TEXT PRIMARY KEY)")
+
+    def __contains__(self, row: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM wanted WHERE id = ?", (row,)).fetchone() is not None
+
+    def want(self, ids: List[str]) -> None:
+        self._conn.executemany("INSERT INTO wanted VALUES (?)", ((i,) for i in ids))
+
+    def remove(self, ids: List[str]) -> None:
+        self._conn.executemany("INSERT OR IGNORE INTO removed VALUES (?)", ((i,) for i in ids))
+
+    def removed(self, batch: int) -> Iterator[List[str]]:
+        cur = self._conn.execute("SELECT id FROM removed")
+        while True:
+            rows = cur.fetchmany(batch)
+            if not rows:
+                return
+            yield [r[0] for r in rows]
+
+    def close(self) -> None:
+        self._conn.close()
+
+def with_lexical(retrievers: Dict, sales_table: Optional[SalesTable] = None, dataset: str = DEFAULT_DATASET) -> Dict:
+    """Fuse BM25/typed-index hits into the vector retrievers wherever the ingest-time index exists."""
+    sales_table = sales_table if sales_table is not None else SalesTable.load(dataset_path(SALES_TABLE_PATH, dataset))
+    if sales_table is not None and len(sales_table):
+        retrievers["retrieval_sales"] = HybridRetriever(retrievers["retrieval_sales"], SalesLexicalIndex(sales_table))
+    faq_index = BM25Index.load(dataset_path(FAQ_INDEX_PATH, dataset))
+    if faq_index is not None and len(faq_index):
+        retrievers["retrieval_faq"] = HybridRetriever(retrievers["retrieval_faq"], faq_index)
+    return retrievers
+
+class StorageBackend:
+    """Where embedded rows live. Subclasses provide the store primitives; ingestion is shared.
+
+    Datasets share the two tables; every row carries metadata.dataset and every primitive
+    is scoped to one dataset, so re-ingesting one never touches another's rows.
+    """
+
+    name = "base"
+
+    def warm(self) -> None:
+        """Open clients and import store modules ahead of the first request."""
+
+    async def aconnect(self) -> None:
+        """Open any async clients (called once from the app lifespan)."""
+
+    def is_empty(self, table_name: str, dataset: str = DEFAULT_DATASET) -> bool:
+        raise NotImplementedError
+
+    def delete_all(self, table_name: str, dataset: str = DEFAULT_DATASET) -> int:
+        raise NotImplementedError
+
+    def iter_stored_ids(self, table_name: str, dataset: str = DEFAULT_DATASET) -> Iterator[List[str]]:
+        """Ids of the dataset's rows, page by page."""
+        raise NotImplementedError
+
+    def existing_ids(self, table_name: str, ids: List[str], dataset: str = DEFAULT_DATASET) -> Set[str]:
+        """The subset of `ids` already stored for the dataset."""
+        raise NotImplementedError
+
+    def delete_ids(self, table_name: str, ids: Iterable[str]) -> int:
+        raise NotImplementedError
+
+    def pipeline(self, table_name: str, embeddings) -> IngestPipeline:
+        raise NotImplementedError
+
+    def open_retrievers(self, sales_table: Optional[SalesTable] = None, hybrid: bool = HYBRID_RETRIEVAL,
+                        dataset: str = DEFAULT_DATASET) -> Dict:
+        """The artifacts dict RoutedDocsRetriever expects: retrieval_sales / retrieval_faq."""
+        raise NotImplementedError
+
+    def full_scan_retriever(self, dataset: str = DEFAULT_DATASET) -> BaseRetriever:
+        """Every sales row of the dataset, regardless of the query (AllCSVRetriever semantics)."""
+        raise NotImplementedError
+
+    def populated(self, dataset: str = DEFAULT_DATASET) -> bool:
+        return not (self.is_empty(SALES_TABLE, dataset) or self.is_empty(FAQ_TABLE, dataset))
+
+    def store_documents(self, table_name: str, docs: Iterable[Document], embeddings,
+                        progress: Progress = _no_progress, total: Optional[int] = None) -> Dict:
+        return self.pipeline(table_name, embeddings).run(docs, total=total, progress=progress)
+
+    def sync_documents(self, table_name: str, docs: Iterable[Document], embeddings,
+                       progress: Progress = _no_progress, dataset: str = DEFAULT_DATASET,
+                       total: Optional[int] = None) -> Dict:
+        """Make the dataset's rows equal `docs`, embedding only rows whose hash is not stored yet.
+
+        New rows go in before removed ones are deleted, so the dataset stays queryable throughout.
+        Rows are diffed in DIFF_BATCH batches against the store and the wanted ids are staged on disk,
+        so memory stays flat however large the file is.
+        """
+        progress("diffing")
+        staged, counts = _StagedIds(), {"unchanged": 0, "deleted": 0}
+
+        def changed() -> Iterator[Document]:
+            rows = iter(docs)
+            while batch := list(islice(rows, DIFF_BATCH)):
+                ids: List[str] = []
+                seen: Set[str] = set()
+                for doc in batch:
+                    digest = content_hash(doc)
+                    # identical rows get successive occurrence numbers, in file order
+                    occurrence, doc.id = 0, row_id(dataset, digest)
+                    while doc.id in seen or doc.id in staged:
+                        occurrence += 1
+                        doc.id = row_id(dataset, digest, occurrence)
+                    doc.metadata.update(dataset=dataset, content_hash=digest)
+                    ids.append(doc.id)
+                    seen.add(doc.id)
+                staged.want(ids)
+                present = self.existing_ids(table_name, ids, dataset)
+                counts["unchanged"] += len(present)
+                yield from (doc for doc in batch if doc.id not in present)
+
+        try:
+            stats = self.store_documents(table_name, changed(), embeddings, progress, total)
+            for page in self.iter_stored_ids(table_name, dataset):
+                staged.remove([i for i in page if i not in staged])
+            for ids in staged.removed(DIFF_BATCH):
+                progress("deleting", counts["deleted"], 0)
+                self.delete_ids(table_name, ids)
+                counts["deleted"] += len(ids)
+        finally:
+            staged.close()
+        stats.update(counts)
+        last_run_stats[table_name] = dict(stats)
+        return stats
+
+    def ingest_sales(self, embeddings, csv_path: str, progress: Progress = _no_progress,
+                     dataset: str = DEFAULT_DATASET) -> None:
+        progress("loading")
+        table = SalesTableBuilder()
+        # rows stream from disk straight into the embedding pipeline; the column store fills on the way
+        sales_docs = iter_sales_documents(csv_path, SALES_LOADER_SETTINGS["encoding"], on_row=table.add)
+        first = next(sales_docs, None)
+        if first is None:
+            raise RuntimeError(f"No rows loaded from CSV: {csv_path}")
+        self.sync_documents(SALES_TABLE, chain([first], sales_docs), embeddings, progress, dataset,
+                            total=count_data_lines(csv_path))
+        table.build().save(dataset_path(SALES_TABLE_PATH, dataset))
+
+    def ingest_faq(self, embeddings, txt_path: str, progress: Progress = _no_progress,
+                   dataset: str = DEFAULT_DATASET) -> None:
+        progress("splitting")
+        lexical = BM25IndexBuilder(dataset_path(FAQ_INDEX_PATH, dataset))
+        faq_docs = iter_faq_documents(str(Path(txt_path)), encoding="utf-8", on_chunk=lexical.add,
+                                      **FAQ_SPLITTER_SETTINGS)
+        first = next(faq_docs, None)
+        if first is None:
+            raise RuntimeError(f"No text loaded from TXT: {txt_path}")
+        self.sync_documents(FAQ_TABLE, chain([first], faq_docs), embeddings, progress, dataset)
+        lexical.build()
+
+    def ingest(self, csv_path: Optional[str], txt_path: Optional[str],
+               progress: Progress = _no_progress, dataset: str = DEFAULT_DATASET) -> Dict[str, str]:
+        """Embed and store the given files into one dataset, skipping any whose fingerprint is unchanged."""
+        embeddings = get_embeddings()
+        status: Dict[str, str] = {}
+
+        if csv_path and Path(csv_path).is_file():
+            fp, key = sales_fingerprint(csv_path), dataset_key(SALES_TABLE, dataset)
+            if fp == stored_fingerprint(key) and not self.is_empty(SALES_TABLE, dataset):
+                status[SALES_TABLE] = "unchanged"
+            else:
+                self.ingest_sales(embeddings, csv_path, progress, dataset)
+                record_fingerprint(key, fp, csv_path)
+                status[SALES_TABLE] = "ingested"
+            table_path = dataset_path(SALES_TABLE_PATH, dataset)
+            if not table_path.is_file():
+                build_sales_table(csv_path, SALES_LOADER_SETTINGS["encoding"], table_path)
+
+        if txt_path and Path(txt_path).is_file():
+            fp, key = faq_fingerprint(txt_path), dataset_key(FAQ_TABLE, dataset)
+            if fp == stored_fingerprint(key) and not self.is_empty(FAQ_TABLE, dataset):
+                status[FAQ_TABLE] = "unchanged"
+            else:
+                self.ingest_faq(embeddings, txt_path, progress, dataset)
+                record_fingerprint(key, fp, txt_path)
+                status[FAQ_TABLE] = "ingested"
+            index_path = dataset_path(FAQ_INDEX_PATH, dataset)
+            if not index_path.is_file():
+                build_faq_index(str(Path(txt_path)), index_path)
+
+        return status
+
+_backend: Optional[StorageBackend] = None
+_backend_lock = threading.Lock()
+
+def get_backend(name: str = STORAGE_BACKEND) -> StorageBackend:
+    """Process-wide backend chosen by STORAGE_BACKEND; implementations import lazily."""
+    global _backend
+    with _backend_lock:
+        if _backend is None or _backend.name != name:
+            if name == "supabase":
+                from graph.retrievals.supabase_retriever import SupabaseBackend
+
+                _backend = SupabaseBackend()
+            elif name == "chroma":
+                from graph.retrievals.data_retriever import ChromaBackend
+
+                _backend = ChromaBackend()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND {name!r}; expected 'supabase' or 'chroma'")
+        return _backend
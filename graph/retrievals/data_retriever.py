@@ -1,14 +1,26 @@
-from langchain_community.document_loaders import CSVLoader, TextLoader, DirectoryLoader
-from langchain_community.vectorstores import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import os
+import threading
 from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
 from dotenv import load_dotenv
-import chromadb
-import os
+from pydantic import PrivateAttr
+
+from graph.datasets import DEFAULT_DATASET, dataset_filter
+from graph.retrievals.all_csv_retriever import AllCSVRetriever
+from graph.retrievals.backends import FAQ_TABLE, HYBRID_RETRIEVAL, SALES_TABLE, StorageBackend, with_lexical
+from graph.retrievals.embedding_cache import get_embeddings
+from graph.retrievals.ingest_pipeline import IngestPipeline
+from graph.retrievals.sales_table import SalesTable
 
 load_dotenv()
 
+CHROMA_PERSIST_DIR = os.environ.get("CHROMA_PERSIST_DIR", "./uploads/.chroma")
+CHROMA_COLLECTION_METADATA = {"hnsw:space": "cosine"}
+CHROMA_DELETE_BATCH = 5000
+CHROMA_ID_PAGE = 5000
+
 def collection_exists(name: str, client) -> bool:
     try:
         client.get_collection(name)
@@ -16,54 +28,125 @@ def collection_exists(name: str, client) -> bool:
     except Exception:
         return False
 
-def data_retriever(PERSIST_DIR: str, CSV_PATH: str, TXT_PATH: str):
-    persist_dir_path = Path(PERSIST_DIR)
-    persist_dir_path.mkdir(parents=True, exist_ok=True)
-
-    embeddings = GoogleGenerativeAIEmbeddings(model="gemini-embedding-001")
-
-    client = chromadb.PersistentClient(path=PERSIST_DIR)
-
-    if not collection_exists("sales_collection", client):
-        csv_loader = CSVLoader(CSV_PATH, encoding="windows-1252")
-        csv_docs = csv_loader.load()
-
-        Chroma.from_documents(
-            documents=csv_docs,
-            embedding=embeddings,
-            persist_directory=PERSIST_DIR,
-            collection_name="sales_collection",
-        ).persist()
-
-    if not collection_exists("faq_collection", client):
-        faq_docs = []
-        txt_path = Path(TXT_PATH)
-        faq_docs = TextLoader(str(txt_path), encoding="utf-8").load()
-
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=100, chunk_overlap=20)
-        texts = text_splitter.split_documents(faq_docs)
-
-        print("Total Chunks created from text file: ",len(texts))
-
-        Chroma.from_documents(
-            documents=texts,
-            embedding=embeddings,
-            persist_directory=PERSIST_DIR,
-            collection_name="faq_collection",
-        ).persist()
-
-    db1 = Chroma(
-        persist_directory=PERSIST_DIR,
-        collection_name="sales_collection",
-        embedding_function=embeddings,
-    )
-    db2 = Chroma(
-        persist_directory=PERSIST_DIR,
-        collection_name="faq_collection",
-        embedding_function=embeddings,
-    )
-
-    csv_retriever = db1.as_retriever()
-    faq_retriever = db2.as_retriever()
-
-    return csv_retriever, faq_retriever
+class ChromaScanRetriever(AllCSVRetriever):
+    """AllCSVRetriever over a local Chroma collection: same paging/snapshot logic, no network."""
+
+    _collection: any = PrivateAttr(default=None)
+
+    def __init__(self, collection, dataset: str = DEFAULT_DATASET, **data):
+        super().__init__(None, dataset=dataset, **data)
+        self._collection = collection
+
+    def _fetch_page(self, start: int, with_count: bool = False):
+        where = dataset_filter(self._dataset)
+        got = self._collection.get(where=where, limit=self._page_size, offset=start,
+                                   include=["documents", "metadatas"])
+        data = [{"content": c, "metadata": m} for c, m in zip(got["documents"], got["metadatas"])]
+        count = len(self._collection.get(where=where, include=[])["ids"]) if with_count else None
+        return SimpleNamespace(data=data, count=count)
+
+class ChromaBackend(StorageBackend):
+    """Rows in a local persistent Chroma store: vector queries and full scans stay in-process."""
+
+    name = "chroma"
+
+    def __init__(self, persist_dir: str = CHROMA_PERSIST_DIR):
+        self.persist_dir = persist_dir
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                import chromadb
+                from chromadb.config import Settings
+
+                Path(self.persist_dir).mkdir(parents=True, exist_ok=True)
+                self._client = chromadb.PersistentClient(path=self.persist_dir,
+                                                         settings=Settings(anonymized_telemetry=False))
+            return self._client
+
+    def collection(self, table_name: str):
+        return self.client.get_or_create_collection(table_name, metadata=CHROMA_COLLECTION_METADATA)
+
+    def warm(self) -> None:
+        self.client
+        from langchain_community.vectorstores import Chroma  # noqa: F401
+
+    def is_empty(self, table_name: str, dataset: str = DEFAULT_DATASET) -> bool:
+        if not collection_exists(table_name, self.client):
+            return True
+        return not self.collection(table_name).get(where=dataset_filter(dataset), limit=1, include=[])["ids"]
+
+    def delete_all(self, table_name: str, dataset: str = DEFAULT_DATASET) -> int:
+        if not collection_exists(table_name, self.client):
+            return 0
+        # delete rows rather than the collection so retrievers opened on it stay valid
+        collection = self.collection(table_name)
+        deleted = 0
+        while ids := collection.get(where=dataset_filter(dataset), limit=CHROMA_DELETE_BATCH, include=[])["ids"]:
+            collection.delete(ids=ids)
+            deleted += len(ids)
+        return deleted
+
+    def iter_stored_ids(self, table_name: str, dataset: str = DEFAULT_DATASET) -> Iterator[List[str]]:
+        if not collection_exists(table_name, self.client):
+            return
+        collection, offset = self.collection(table_name), 0
+        while True:
+            ids = collection.get(where=dataset_filter(dataset), include=[], limit=CHROMA_ID_PAGE, offset=offset)["ids"]
+            if ids:
+                yield ids
+            if len(ids) < CHROMA_ID_PAGE:
+                return
+            offset += CHROMA_ID_PAGE
+
+    def existing_ids(self, table_name: str, ids: List[str], dataset: str = DEFAULT_DATASET) -> Set[str]:
+        if not collection_exists(table_name, self.client):
+            return set()
+        return set(self.collection(table_name).get(ids=ids, where=dataset_filter(dataset), include=[])["ids"])
+
+    def delete_ids(self, table_name: str, ids: Iterable[str]) -> int:
+        collection, ids = self.collection(table_name), list(ids)
+        for i in range(0, len(ids), CHROMA_DELETE_BATCH):
+            collection.delete(ids=ids[i:i + CHROMA_DELETE_BATCH])
+        return len(ids)
+
+    def pipeline(self, table_name: str, embeddings) -> IngestPipeline:
+        collection = self.collection(table_name)
+
+        def write(rows: List[Dict]) -> None:
+            collection.upsert(
+                ids=[r["id"] for r in rows],
+                embeddings=[r["embedding"] for r in rows],
+                documents=[r["content"] for r in rows],
+                metadatas=[r["metadata"] or None for r in rows],
+            )
+
+        return IngestPipeline(None, table_name, embeddings, writer=write)
+
+    def open_retrievers(self, sales_table: Optional[SalesTable] = None, hybrid: bool = HYBRID_RETRIEVAL,
+                        dataset: str = DEFAULT_DATASET) -> Dict:
+        from langchain_community.vectorstores import Chroma
+
+        embeddings = get_embeddings()
+        retrievers = {
+            key: Chroma(
+                client=self.client,
+                collection_name=table_name,
+                embedding_function=embeddings,
+                collection_metadata=CHROMA_COLLECTION_METADATA,
+            ).as_retriever(search_type="similarity", search_kwargs={"k": 5, "filter": dataset_filter(dataset)})
+            for key, table_name in (("retrieval_sales", SALES_TABLE), ("retrieval_faq", FAQ_TABLE))
+        }
+        return with_lexical(retrievers, sales_table, dataset) if hybrid else retrievers
+
+    def full_scan_retriever(self, dataset: str = DEFAULT_DATASET) -> ChromaScanRetriever:
+        return ChromaScanRetriever(self.collection(SALES_TABLE), dataset=dataset)
+
+def data_retriever(PERSIST_DIR: str, CSV_PATH: Optional[str], TXT_PATH: Optional[str]) -> Dict:
+    """Ingest into a local Chroma store and return the same artifacts dict as the Supabase path."""
+    backend = ChromaBackend(PERSIST_DIR)
+    backend.ingest(CSV_PATH, TXT_PATH)
+    return backend.open_retrievers()
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from graph.metrics import span
+
+EMBEDDING_MODEL = "gemini-embedding-001"
+CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "./uploads/.embedding_cache.sqlite")
+CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+# the row count is tracked in memory; re-read it after this many inserts since other workers share the file
+CACHE_RECOUNT_EVERY = 1000
+
+class EmbeddingCache:
+    """On-disk float32 vector cache keyed by (model, task, sha256(text)), evicted LRU."""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vec BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        self._since_recount = 0
+
+    @staticmethod
+    def key(model: str, task: str, text: str) -> str:
+        return f"{model}:{task}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        if not keys:
+            return found
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vec FROM embeddings WHERE key IN ({marks})", part
+                ).fetchall()
+                for k, blob in rows:
+                    found[k] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def peek(self, key: str) -> Optional[List[float]]:
+        # lookup without touching LRU order or hit/miss counters
+        with self._lock:
+            row = self._conn.execute("SELECT vec FROM embeddings WHERE key = ?", (key,)).fetchone()
+        return array("f", row[0]).tolist() if row else None
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            added = len(items) - self._stored(list(items))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vec, last_used) VALUES (?, ?, ?)",
+                [(k, array("f", v).tobytes(), now) for k, v in items.items()],
+            )
+            self._count += added
+            self._since_recount += added
+            self._evict()
+            self._conn.commit()
+
+    def _stored(self, keys: List[str]) -> int:
+        stored = 0
+        for i in range(0, len(keys), 500):
+            part = keys[i:i + 500]
+            marks = ",".join("?" * len(part))
+            (n,) = self._conn.execute(f"SELECT COUNT(*) FROM embeddings WHERE key IN ({marks})", part).fetchone()
+            stored += n
+        return stored
+
+    def _evict(self) -> None:
+        if self._since_recount >= CACHE_RECOUNT_EVERY:
+            (self._count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            self._since_recount = 0
+        excess = self._count - self.max_entries
+        if excess > 0:
+            cur = self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self._count -= cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count}
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends texts missing from the cache to the model."""
+
+    def __init__(self, inner: Embeddings, model: str, cache: EmbeddingCache):
+        self.inner = inner
+        self.model = model
+        self.cache = cache
+
+    def _embed(self, texts: List[str], task: str) -> List[List[float]]:
+        keys = [EmbeddingCache.key(self.model, task, t) for t in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+        # deduplicate the misses so each distinct text is embedded once
+        missing: Dict[str, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+        if missing:
+            with span("embed", task=task):
+                if task == "query":
+                    vectors = [self.inner.embed_query(t) for t in missing.values()]
+                else:
+                    vectors = self.inner.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return [found[k] for k in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    def cached_query(self, text: str) -> Optional[List[float]]:
+        """Return the query vector only if it is already cached (never calls the model)."""
+        return self.cache.peek(EmbeddingCache.key(self.model, "query", text))
+
+_embeddings: Optional[CachedEmbeddings] = None
+_embeddings_lock = threading.Lock()
+
+def get_embeddings() -> CachedEmbeddings:
+    """Process-wide cached embeddings shared by ingestion and query paths."""
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+            _embeddings = CachedEmbeddings(
+                GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL),
+                EMBEDDING_MODEL,
+                EmbeddingCache(),
+            )
+        return _embeddings
@@ -0,0 +1,20 @@
+import hashlib
+import json
+from typing import Dict, Optional
+
+from graph.coordination import get_coordinator
+
+def file_fingerprint(path: str, settings: Dict) -> str:
+    # hash of file bytes + loader/splitter settings + embedding model
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    h.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+def stored_fingerprint(dataset: str) -> Optional[str]:
+    return get_coordinator().fingerprint(dataset)
+
+def record_fingerprint(dataset: str, fingerprint: str, path: str) -> None:
+    get_coordinator().set_fingerprint(dataset, fingerprint, path)
@@ -0,0 +1,250 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from graph.metrics import span
+from graph.retrievals.loaders import SalesRow, months_in, sales_row_document
+from graph.retrievals.sales_table import SalesTable
+
+FAQ_INDEX_PATH = Path(os.environ.get("FAQ_INDEX_PATH", "./uploads/.faq_index.sqlite"))
+RRF_K = 60  # reciprocal-rank fusion constant
+TOKEN = re.compile(r"\d+(?:\.\d+)?|[a-z]+")
+NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i if in is it me my of on or our the this to "
+    "was we what when where which who why will with you your".split()
+)
+
+Hits = Tuple[List[Document], bool]  # ranked documents, whether they answer the query exactly
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+def _top(ids: np.ndarray, weights: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    """Sum weights per id and return the k best (id, score) pairs."""
+    if ids.size == 0:
+        return []
+    uniq, inverse = np.unique(ids, return_inverse=True)
+    scores = np.bincount(inverse, weights=weights)
+    k = min(k, uniq.size)
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best], kind="stable")]
+    return [(int(uniq[i]), float(scores[i])) for i in best]
+
+class BM25Index:
+    """Okapi BM25 over the FAQ chunks, stored in one SQLite file so neither build nor search holds it all.
+
+    postings(token, id, tf, length) carries the chunk length, so scoring a token is a single indexed read.
+    """
+
+    def __init__(self, path: Path, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1, self.b = k1, b
+        # immutable: the file is only ever replaced by rename, never written in place
+        self._conn = sqlite3.connect(f"file:{path}?immutable=1", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.count, self.avg_length = self._conn.execute("SELECT count, avg_length FROM stats").fetchone()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def scores(self, query: str, k: int) -> List[Tuple[int, float]]:
+        ids, weights = [], []
+        for token in set(tokenize(query)):
+            with self._lock:
+                rows = self._conn.execute("SELECT id, tf, length FROM postings WHERE token = ?", (token,)).fetchall()
+            if not rows:
+                continue
+            doc_ids, tf, lengths = (np.asarray(col, dtype=dtype)
+                                    for col, dtype in zip(zip(*rows), (np.int32, np.float32, np.float32)))
+            idf = math.log(1 + (self.count - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths / (self.avg_length or 1.0))
+            ids.append(doc_ids)
+            weights.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not ids:
+            return []
+        return _top(np.concatenate(ids), np.concatenate(weights), k)
+
+    def search(self, query: str, k: int) -> Hits:
+        docs = []
+        for i, s in self.scores(query, k):
+            with self._lock:
+                content, metadata = self._conn.execute(
+                    "SELECT content, metadata FROM chunks WHERE id = ?", (i,)).fetchone()
+            docs.append(Document(page_content=content, metadata={**json.loads(metadata), "bm25": round(s, 4)}))
+        return docs, False
+
+    @classmethod
+    def load(cls, path: Path = FAQ_INDEX_PATH) -> Optional["BM25Index"]:
+        if not path.is_file():
+            return None
+        try:
+            return cls(path)
+        except sqlite3.DatabaseError:
+            return None  # older/foreign format: rebuilt on the next ingest
+
+class BM25IndexBuilder:
+    """Writes chunks and their postings to disk as they stream through ingestion."""
+
+    def __init__(self, path: Path = FAQ_INDEX_PATH):
+        self.path = path
+        self._tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp.unlink(missing_ok=True)
+        self._conn = sqlite3.connect(self._tmp, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("CREATE TABLE chunks (id INTEGER PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE postings (token TEXT NOT NULL, id INTEGER NOT NULL, tf REAL NOT NULL, "
+                           "length REAL NOT NULL)")
+        self._count, self._total_length = 0, 0
+
+    def add(self, doc: Document) -> None:
+        counts = Counter(tokenize(doc.page_content))
+        length = sum(counts.values())
+        i = self._count
+        self._conn.execute("INSERT INTO chunks VALUES (?, ?, ?)",
+                           (i, doc.page_content, json.dumps(dict(doc.metadata), default=str)))
+        self._conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)",
+                               ((token, i, tf, length) for token, tf in counts.items()))
+        self._count += 1
+        self._total_length += length
+
+    def build(self) -> BM25Index:
+        """Index the postings, then atomically replace the file at `path`."""
+        self._conn.execute("CREATE INDEX postings_token ON postings (token)")
+        self._conn.execute("CREATE TABLE stats (count INTEGER NOT NULL, avg_length REAL NOT NULL)")
+        self._conn.execute("INSERT INTO stats VALUES (?, ?)",
+                           (self._count, self._total_length / self._count if self._count else 0.0))
+        self._conn.commit()
+        self._conn.close()
+        self._tmp.replace(self.path)
+        return BM25Index(self.path)
+
+class NumericIndex:
+    """Sorted view of one column: exact-value lookups by binary search."""
+
+    def __init__(self, values: np.ndarray):
+        self.order = np.argsort(values, kind="stable")
+        self.sorted = values[self.order]
+
+    def equal(self, value: float) -> np.ndarray:
+        lo = int(np.searchsorted(self.sorted, value, side="left"))
+        hi = int(np.searchsorted(self.sorted, value, side="right"))
+        return self.order[lo:hi]
+
+class SalesLexicalIndex:
+    """Typed year/month/Total_Sales/Transactions indexes over the sales column store.
+
+    Each row has exactly four field tokens, so BM25 reduces to summing the IDF of the query tokens
+    a row matches; numbers are matched as values, not strings, so "1805" finds 1805.0.
+    """
+
+    def __init__(self, table: SalesTable):
+        self.table = table
+        self.columns = {
+            "year": NumericIndex(table.year),
+            "total_sales": NumericIndex(table.total_sales),
+            "transactions": NumericIndex(table.transactions),
+        }
+
+    def _idf(self, df: int) -> float:
+        n = len(self.table)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, k: int) -> Hits:
+        q = query.lower()
+        ids, weights, exact = [], [], []
+        for number in {float(n) for n in NUMBER.findall(q)}:
+            for column, index in self.columns.items():
+                rows = index.equal(number)
+                if rows.size:
+                    ids.append(rows)
+                    weights.append(np.full(rows.size, self._idf(rows.size)))
+                    if column != "year":
+                        exact.append(rows)
+        for month in months_in(query):
+            rows = self.table.by_month.get(month)
+            if rows is not None:
+                ids.append(rows)
+                weights.append(np.full(rows.size, self._idf(rows.size)))
+        if not ids:
+            return [], False
+        ids, weights = np.concatenate(ids), np.concatenate(weights)
+        if exact:
+            # a Total_Sales/Transactions value matched: only those rows answer the question
+            keep = np.isin(ids, np.concatenate(exact))
+            ids, weights = ids[keep], weights[keep]
+        docs = []
+        for i, score in _top(ids, weights, k):
+            doc = sales_row_document(SalesRow(i, int(self.table.month[i]), int(self.table.year[i]),
+                                              float(self.table.total_sales[i]), int(self.table.transactions[i])))
+            doc.metadata["bm25"] = round(score, 4)
+            docs.append(doc)
+        return docs, bool(exact)
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Document]], k: int, c: int = RRF_K) -> List[Document]:
+    """Merge ranked lists by sum(1 / (c + rank)); identical chunks from different lists count once."""
+    fused: Dict[str, Tuple[float, Document, List[str]]] = {}
+    for name, docs in rankings.items():
+        for rank, doc in enumerate(docs):
+            key = " ".join(doc.page_content.split())
+            score, first, sources = fused.get(key, (0.0, doc, []))
+            fused[key] = (score + 1.0 / (c + rank + 1), first, sources + [name])
+    best = sorted(fused.values(), key=lambda item: -item[0])[:k]
+    return [Document(page_content=d.page_content,
+                     metadata={**d.metadata, "score": round(s, 5), "matched_by": sources})
+            for s, d, sources in best]
+
+class HybridRetriever(BaseRetriever):
+    """Lexical/typed index fused with a vector retriever; exact typed hits skip the vector search."""
+
+    _vector: Any = PrivateAttr(default=None)
+    _lexical: Any = PrivateAttr(default=None)
+    _k: int = PrivateAttr(default=5)
+    _fetch_k: int = PrivateAttr(default=10)
+
+    def __init__(self, vector_retriever, lexical_index, k: int = 5, fetch_k: int = 10, **data):
+        super().__init__(**data)
+        self._vector = vector_retriever
+        self._lexical = lexical_index
+        self._k = k
+        self._fetch_k = fetch_k
+
+    def _lexical_hits(self, query: str) -> Hits:
+        with span("lexical"):
+            return self._lexical.search(query, self._fetch_k)
+
+    def lexical_search(self, query: str) -> List[Document]:
+        """Lexical/typed hits alone: the in-memory fallback when the vector search runs out of time."""
+        lexical, _ = self._lexical_hits(query)
+        return reciprocal_rank_fusion({"lexical": lexical}, self._k)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        lexical, exact = self._lexical_hits(query)
+        if exact:
+            return reciprocal_rank_fusion({"lexical": lexical}, self._k)
+        vector = self._vector.invoke(query, config={"callbacks": run_manager.get_child()})
+        return reciprocal_rank_fusion({"lexical": lexical, "vector": vector}, self._k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        lexical, exact = self._lexical_hits(query)
+        if exact:
+            return reciprocal_rank_fusion({"lexical": lexical}, self._k)
+        vector = await self._vector.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return reciprocal_rank_fusion({"lexical": lexical, "vector": vector}, self._k)
@@ -0,0 +1,154 @@
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+from graph.metrics import INGEST_ROWS, span
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = int(os.environ.get("INGEST_EMBED_BATCH", "100"))
+INSERT_BATCH_SIZE = int(os.environ.get("INGEST_INSERT_BATCH", "500"))
+EMBED_CONCURRENCY = int(os.environ.get("INGEST_EMBED_CONCURRENCY", "4"))
+INSERT_CONCURRENCY = int(os.environ.get("INGEST_INSERT_CONCURRENCY", "2"))
+MAX_RETRIES = int(os.environ.get("INGEST_MAX_RETRIES", "6"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_MARKERS = ("429", "resource_exhausted", "rate limit", "too many requests", "unavailable", "timed out", "timeout")
+
+# most recent run per table, reported by ingestion jobs
+last_run_stats: Dict[str, Dict] = {}
+
+def _status_of(e: Exception) -> Optional[int]:
+    for value in (getattr(e, "code", None), getattr(e, "status_code", None),
+                  getattr(getattr(e, "response", None), "status_code", None)):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def is_retryable(e: Exception) -> bool:
+    status = _status_of(e)
+    if status is not None:
+        return status in RETRY_STATUSES
+    message = str(e).lower()
+    return any(m in message for m in RETRY_MARKERS)
+
+def with_backoff(fn: Callable, *args, retries: int = MAX_RETRIES, base_delay: float = 0.5,
+                 max_delay: float = 30.0, on_retry: Optional[Callable[[], None]] = None):
+    """Call fn, retrying rate-limit/5xx failures with exponential backoff and full jitter."""
+    for attempt in range(retries + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            if on_retry:
+                on_retry()
+            delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            logger.warning(f"Retrying after {type(e).__name__} ({e}); sleeping {delay:.2f}s")
+            time.sleep(delay)
+
+def _batched(items: Iterable, size: int) -> Iterable[List]:
+    it = iter(items)
+    while batch := list(islice(it, size)):
+        yield batch
+
+class IngestPipeline:
+    """Concurrent batched embedding feeding a concurrent batched insert stage."""
+
+    def __init__(self, supabase_client, table_name: str, embeddings,
+                 embed_batch: int = EMBED_BATCH_SIZE, insert_batch: int = INSERT_BATCH_SIZE,
+                 embed_concurrency: int = EMBED_CONCURRENCY, insert_concurrency: int = INSERT_CONCURRENCY,
+                 writer: Optional[Callable[[List[Dict]], None]] = None):
+        self.client = supabase_client
+        self.writer = writer  # replaces the Supabase upsert for other backends
+        self.table_name = table_name
+        self.embeddings = embeddings
+        self.embed_batch = embed_batch
+        self.insert_batch = insert_batch
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.insert_concurrency = max(1, insert_concurrency)
+        self._lock = threading.Lock()
+        self.stats = {"embedded": 0, "inserted": 0, "retries": 0, "elapsed_s": 0.0, "rows_per_sec": 0.0}
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def _embed(self, docs: List[Document]) -> List[Dict]:
+        INGEST_ROWS.observe(len(docs), stage="embed")
+        with span("ingest_embed", table=self.table_name):
+            vectors = with_backoff(self.embeddings.embed_documents, [d.page_content for d in docs],
+                                   on_retry=lambda: self._count("retries"))
+        self._count("embedded", len(docs))
+        return [
+            # documents carrying an id (content-addressed by the backends) keep it, so re-runs upsert in place
+            {"id": d.id or str(uuid.uuid4()), "content": d.page_content, "metadata": d.metadata, "embedding": v}
+            for d, v in zip(docs, vectors)
+        ]
+
+    def _insert_once(self, rows: List[Dict]) -> None:
+        if self.writer is not None:
+            self.writer(rows)
+            return
+        result = self.client.from_(self.table_name).upsert(rows).execute()
+        if not getattr(result, "data", None):
+            raise RuntimeError(f"Error inserting into {self.table_name}: no rows added")
+
+    def _insert(self, rows: List[Dict]) -> None:
+        INGEST_ROWS.observe(len(rows), stage="insert")
+        with span("ingest_insert", table=self.table_name):
+            with_backoff(self._insert_once, rows, on_retry=lambda: self._count("retries"))
+        self._count("inserted", len(rows))
+
+    def run(self, docs: Iterable[Document], total: Optional[int] = None,
+            progress: Callable[..., None] = lambda *a, **k: None) -> Dict:
+        start = time.perf_counter()
+        total = total or 0
+        embeds: "deque[Future]" = deque()
+        inserts: "deque[Future]" = deque()
+        buffer: List[Dict] = []
+
+        with ThreadPoolExecutor(self.embed_concurrency, thread_name_prefix="embed") as embed_pool, \
+                ThreadPoolExecutor(self.insert_concurrency, thread_name_prefix="insert") as insert_pool:
+
+            def flush(force: bool = False) -> None:
+                while len(buffer) >= self.insert_batch or (force and buffer):
+                    chunk = buffer[:self.insert_batch]
+                    del buffer[:self.insert_batch]
+                    inserts.append(insert_pool.submit(self._insert, chunk))
+                    # bound in-flight inserts so memory stays flat
+                    while len(inserts) > self.insert_concurrency * 2:
+                        inserts.popleft().result()
+
+            def drain_embed() -> None:
+                buffer.extend(embeds.popleft().result())
+                progress("embedding", self.stats["embedded"], total)
+                flush()
+
+            for batch in _batched(docs, self.embed_batch):
+                embeds.append(embed_pool.submit(self._embed, batch))
+                while len(embeds) > self.embed_concurrency * 2:
+                    drain_embed()
+            while embeds:
+                drain_embed()
+            flush(force=True)
+            while inserts:
+                progress("inserting", self.stats["inserted"], total or self.stats["embedded"])
+                inserts.popleft().result()
+
+        elapsed = time.perf_counter() - start
+        self.stats["elapsed_s"] = round(elapsed, 3)
+        self.stats["rows_per_sec"] = round(self.stats["inserted"] / elapsed, 2) if elapsed > 0 else 0.0
+        progress("inserting", self.stats["inserted"], self.stats["inserted"])
+        last_run_stats[self.table_name] = dict(self.stats)
+        return dict(self.stats)
@@ -0,0 +1,147 @@
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+LABELS = ["FAQ", "SALES_SAMPLE", "SALES_COMPLETE", "SALES_COMPLETE+FAQ", "SALES_SAMPLE+FAQ"]
+
+# "may" is left out: as a word it is far more often the modal verb than the month
+MONTHS = {
+    "january", "february", "march", "april", "june", "july",
+    "august", "september", "october", "november", "december",
+}
+SALES_TERMS = {"sales", "sale", "transaction", "transactions", "revenue", "month", "months", "year", "years"} | MONTHS
+FAQ_TERMS = {
+    "refund", "refunds", "returns", "returnable", "non-returnable", "policy", "policies", "exchange",
+    "credit", "restocking", "receipt", "shipping", "damaged", "packaging", "faq", "warranty",
+}
+FAQ_PHRASES = ("return policy", "return label", "return shipping", "initiate a return", "proof of purchase")
+COMPLETE_TERMS = {
+    "all", "every", "each", "average", "avg", "mean", "median", "sum", "max", "maximum", "min",
+    "minimum", "highest", "lowest", "most", "least", "list", "trend", "compare", "overall", "count", "top",
+}
+COMPLETE_PHRASES = ("how many", "total of", "in total")
+EXACT_PATTERN = re.compile(r"\b(equal to|equals|exactly|is \d+|was \d+)\b")
+YEAR_PATTERN = re.compile(r"\b(19|20)\d{2}\b")
+NUMBER_PATTERN = re.compile(r"\b\d+(\.\d+)?\b")
+
+# Seed questions used to build a centroid per label from cached query embeddings
+SEED_QUESTIONS: Dict[str, List[str]] = {
+    "FAQ": ["What is the refund period?", "How do I initiate a return?", "Is there a restocking fee?"],
+    "SALES_SAMPLE": ["Find month in which total sales is 1000", "Which year had transactions equal to 120?"],
+    "SALES_COMPLETE": ["Find all total sales in 2024", "What is the average total sales per year?"],
+    "SALES_SAMPLE+FAQ": ["Find month in which total sales is 1000 and provide refund policy"],
+    "SALES_COMPLETE+FAQ": ["Find average total sales in 2024 and return policies"],
+}
+
+@dataclass
+class RouteDecision:
+    label: str
+    decided_by: str  # cache | rules | centroid | llm | fallback
+    confidence: float = 1.0
+
+def normalize_question(q: str) -> str:
+    return re.sub(r"\s+", " ", q.strip().lower()).strip(" ?.!")
+
+def _signals(query: str):
+    q = normalize_question(query)
+    words = set(re.findall(r"[a-z][a-z\-]*", q))
+    faq = bool(words & FAQ_TERMS) or any(p in q for p in FAQ_PHRASES)
+    sales = bool(words & SALES_TERMS) or bool(YEAR_PATTERN.search(q))
+    return q, words, faq, sales
+
+class LocalLabelRouter:
+    """Sub-millisecond label guess from keyword rules and label centroids, with an LRU label cache."""
+
+    def __init__(self, embeddings=None, cache_size: int = 2048, min_similarity: float = 0.75, min_margin: float = 0.02):
+        self._embeddings = embeddings
+        self._cache: "OrderedDict[str, RouteDecision]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+        self._min_similarity = min_similarity
+        self._min_margin = min_margin
+        self._centroid_labels: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+
+    def warm(self) -> None:
+        """Embed the seed questions once (cached on disk afterwards) and build unit-norm centroids."""
+        if self._embeddings is None:
+            return
+        labels, rows = [], []
+        for label, questions in SEED_QUESTIONS.items():
+            vecs = np.asarray([self._embeddings.embed_query(q) for q in questions], dtype=np.float32)
+            centroid = vecs.mean(axis=0)
+            rows.append(centroid / (np.linalg.norm(centroid) or 1.0))
+            labels.append(label)
+        self._centroid_labels, self._centroids = labels, np.vstack(rows)
+
+    def lookup(self, query: str) -> Optional[RouteDecision]:
+        key = normalize_question(query)
+        with self._lock:
+            decision = self._cache.get(key)
+            if decision is None:
+                return None
+            self._cache.move_to_end(key)
+        return RouteDecision(decision.label, "cache", decision.confidence)
+
+    def remember(self, query: str, decision: RouteDecision) -> None:
+        key = normalize_question(query)
+        with self._lock:
+            self._cache[key] = decision
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def classify(self, query: str) -> Optional[RouteDecision]:
+        """Return a confident local decision, or None when the LLM should decide."""
+        return self._by_rules(query) or self._by_centroid(query)
+
+    def guess(self, query: str) -> RouteDecision:
+        """Cheapest plausible label when nothing confident is available: top-k only, never a full scan."""
+        _, _, faq, sales = _signals(query)
+        if sales and not faq:
+            label = "SALES_SAMPLE"
+        elif faq and not sales:
+            label = "FAQ"
+        else:
+            label = "SALES_SAMPLE+FAQ"
+        return RouteDecision(label, "fallback", 0.0)
+
+    def _by_rules(self, query: str) -> Optional[RouteDecision]:
+        q, words, faq, sales = _signals(query)
+        if not sales:
+            return RouteDecision("FAQ", "rules", 0.9) if faq else None
+
+        complete = bool(words & COMPLETE_TERMS) or any(p in q for p in COMPLETE_PHRASES)
+        exact = bool(EXACT_PATTERN.search(q)) or bool(NUMBER_PATTERN.search(YEAR_PATTERN.sub("", q)))
+        if complete:
+            # a bare month word is too weak a signal to commit to the full scan; let the centroid/LLM decide
+            if not (words & (SALES_TERMS - MONTHS) or YEAR_PATTERN.search(q)):
+                return None
+            base = "SALES_COMPLETE"
+        elif exact:
+            base = "SALES_SAMPLE"
+        elif YEAR_PATTERN.search(q):
+            base = "SALES_COMPLETE"
+        else:
+            return None
+        return RouteDecision(base + "+FAQ" if faq else base, "rules", 0.9)
+
+    def _by_centroid(self, query: str) -> Optional[RouteDecision]:
+        if self._centroids is None or self._embeddings is None:
+            return None
+        # Only use an embedding that is already cached: a network call would defeat the fast path
+        vec = self._embeddings.cached_query(query)
+        if vec is None:
+            return None
+        v = np.asarray(vec, dtype=np.float32)
+        sims = self._centroids @ (v / (np.linalg.norm(v) or 1.0))
+        order = np.argsort(sims)[::-1]
+        best = float(sims[order[0]])
+        margin = best - float(sims[order[1]]) if len(order) > 1 else best
+        if best < self._min_similarity or margin < self._min_margin:
+            return None
+        return RouteDecision(self._centroid_labels[int(order[0])], "centroid", best)
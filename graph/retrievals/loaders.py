@@ -0,0 +1,137 @@
+import csv
+import re
+from itertools import chain
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from langchain_core.documents import Document
+
+FIELDS = ["Month", "Year", "Total_Sales", "Transactions"]
+MONTH_NAMES = [
+    "January", "February", "March", "April", "May", "June", "July",
+    "August", "September", "October", "November", "December",
+]
+MONTH_INDEX = {m.lower(): i + 1 for i, m in enumerate(MONTH_NAMES)}
+MONTH_INDEX.update({m[:3].lower(): i + 1 for i, m in enumerate(MONTH_NAMES)})
+MONTH_INDEX["sept"] = 9
+# words next to "may" that make it the month rather than the modal verb
+MONTH_CUES = {"sales", "sale", "revenue", "transaction", "transactions", "total", "month"}
+WORD = re.compile(r"[A-Za-z]+|\d+")
+READ_BLOCK_SIZE = 64 * 1024
+
+class SalesRow(NamedTuple):
+    row: int
+    month: int
+    year: int
+    total_sales: float
+    transactions: int
+
+def month_number(value: str) -> int:
+    value = value.strip().strip('"')
+    if value.isdigit():
+        return int(value)
+    return MONTH_INDEX.get(value.lower(), 0)
+
+def months_in(text: str) -> List[int]:
+    """Months named in a question: full names or abbreviations ("jan", "sept").
+
+    "may" counts only when it reads as the month: capitalized mid-sentence, or next to a year or a sales word.
+    """
+    words = list(WORD.finditer(text))
+    found = set()
+    for i, m in enumerate(words):
+        word = m.group().lower()
+        month = MONTH_INDEX.get(word)
+        if month is None:
+            continue
+        if word == "may":
+            neighbours = [words[j].group().lower() for j in (i - 1, i + 1) if 0 <= j < len(words)]
+            cued = any((n.isdigit() and len(n) == 4) or n in MONTH_CUES for n in neighbours)
+            mid_sentence = m.group() == "May" and text[:m.start()].rstrip()[-1:] not in ("", ".", "?", "!")
+            if not (cued or mid_sentence):
+                continue
+        found.add(month)
+    return sorted(found)
+
+def _header_positions(first: List[str]) -> Optional[Dict[str, int]]:
+    # a header row names every field; otherwise the file is positional in FIELDS order
+    names = {c.strip().strip('"').lower(): i for i, c in enumerate(first)}
+    if all(f.lower() in names for f in FIELDS):
+        return {f: names[f.lower()] for f in FIELDS}
+    return None
+
+def iter_sales_rows(path: str, encoding: str = "utf-8") -> Iterator[SalesRow]:
+    """Stream typed rows from the sales CSV; header detection and column mapping happen once."""
+    with open(path, newline="", encoding=encoding) as f:
+        reader = csv.reader(f, delimiter=",", quotechar='"')
+        first = next(reader, None)
+        if first is None:
+            return
+        positions = _header_positions(first)
+        pending = [] if positions else [first]
+        positions = positions or {f: i for i, f in enumerate(FIELDS)}
+        m_i, y_i, s_i, t_i = (positions[f] for f in FIELDS)
+        width = max(m_i, y_i, s_i, t_i) + 1
+
+        row_no = 0
+        for values in chain(pending, reader):
+            if len(values) < width:
+                continue
+            try:
+                month = month_number(values[m_i])
+                year = int(float(values[y_i]))
+                sales = float(values[s_i])
+                tx = int(float(values[t_i]))
+            except ValueError:
+                continue  # malformed line
+            if not 1 <= month <= 12:
+                continue
+            yield SalesRow(row_no, month, year, sales, tx)
+            row_no += 1
+
+def sales_row_document(r: SalesRow) -> Document:
+    # same "Field: value" layout CSVLoader produced, with source = Year
+    content = (f"Month: {MONTH_NAMES[r.month - 1]}\nYear: {r.year}\n"
+               f"Total_Sales: {r.total_sales:g}\nTransactions: {r.transactions}")
+    return Document(page_content=content, metadata={"source": str(r.year), "row": r.row})
+
+def iter_sales_documents(path: str, encoding: str = "utf-8",
+                         on_row: Optional[Callable[[SalesRow], None]] = None) -> Iterator[Document]:
+    for r in iter_sales_rows(path, encoding):
+        if on_row is not None:
+            on_row(r)
+        yield sales_row_document(r)
+
+def count_data_lines(path: str) -> int:
+    with open(path, "rb") as f:
+        return max(0, sum(block.count(b"\n") for block in iter(lambda: f.read(READ_BLOCK_SIZE), b"")) - 1)
+
+def iter_faq_documents(path: str, chunk_size: int, chunk_overlap: int, encoding: str = "utf-8",
+                       block_size: int = READ_BLOCK_SIZE,
+                       on_chunk: Optional[Callable[[Document], None]] = None) -> Iterator[Document]:
+    """Read the text in blocks and split at paragraph breaks so only one block is held in memory."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    metadata = {"source": path}
+    buffer = ""
+    with open(path, encoding=encoding) as f:
+        while block := f.read(block_size):
+            buffer += block
+            cut = buffer.rfind("\n\n")
+            if cut == -1:
+                if len(buffer) < block_size * 4:
+                    continue
+                cut = buffer.rfind("\n")  # no paragraph break for a long stretch: fall back to lines
+                if cut == -1:
+                    cut = len(buffer)
+            head, buffer = buffer[:cut], buffer[cut:]
+            for text in splitter.split_text(head):
+                yield _chunk(text, metadata, on_chunk)
+    for text in splitter.split_text(buffer):
+        yield _chunk(text, metadata, on_chunk)
+
+def _chunk(text: str, metadata: Dict, on_chunk: Optional[Callable[[Document], None]]) -> Document:
+    doc = Document(page_content=text, metadata=dict(metadata))
+    if on_chunk is not None:
+        on_chunk(doc)
+    return doc
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from graph.datasets import DEFAULT_DATASET, dataset_key
+from graph.retrievals.fingerprint import stored_fingerprint
+
+PAGE_SIZE = 1000
+# per-version snapshots (<table>-<fingerprint>.npy/.json) memory-mapped by every worker
+LOCAL_INDEX_DIR = Path(os.environ.get("LOCAL_INDEX_DIR", "./uploads/.vector_index"))
+
+def _parse_embedding(value) -> List[float]:
+    # pgvector comes back from PostgREST as its text form "[0.1,0.2,...]"
+    return json.loads(value) if isinstance(value, str) else list(value)
+
+class LocalVectorIndex:
+    """Contiguous float32 matrix of unit vectors; top-k by dot product + argpartition."""
+
+    def __init__(self, contents: Tuple[str, ...], metadatas: Tuple[Dict, ...], vectors: np.ndarray):
+        self.contents = contents
+        self.metadatas = metadatas
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True) if vectors.size else vectors
+        self.matrix = np.ascontiguousarray(vectors / np.where(norms == 0, 1.0, norms), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    @classmethod
+    def from_supabase(cls, client, table_name: str, page_size: int = PAGE_SIZE,
+                      dataset: str = DEFAULT_DATASET) -> "LocalVectorIndex":
+        contents, metadatas, vectors = [], [], []
+        start = 0
+        while True:
+            resp = (client.table(table_name).select("content, metadata, embedding")
+                    .eq("metadata->>dataset", dataset)
+                    .order("id").range(start, start + page_size - 1).execute())
+            rows = getattr(resp, "data", None) or []
+            for r in rows:
+                if not r.get("content") or r.get("embedding") is None:
+                    continue
+                contents.append(r["content"])
+                metadatas.append(r.get("metadata") or {})
+                vectors.append(_parse_embedding(r["embedding"]))
+            if len(rows) < page_size:
+                break
+            start += page_size
+        matrix = np.asarray(vectors, dtype=np.float32) if vectors else np.zeros((0, 0), dtype=np.float32)
+        return cls(tuple(contents), tuple(metadatas), matrix)
+
+    def save(self, stem: Path) -> None:
+        """Write <stem>.json then <stem>.npy; the .npy appearing marks the snapshot complete."""
+        stem.parent.mkdir(parents=True, exist_ok=True)
+        meta, npy = stem.with_name(stem.name + ".json"), stem.with_name(stem.name + ".npy")
+        # per-process temp names: two workers may build the same snapshot at once
+        tmp = meta.with_name(f"{meta.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"contents": self.contents, "metadatas": self.metadatas}), encoding="utf-8")
+        tmp.replace(meta)
+        tmp = stem.with_name(f"{stem.name}.{os.getpid()}.tmp.npy")
+        np.save(tmp, self.matrix)
+        tmp.replace(npy)
+
+    @classmethod
+    def load(cls, stem: Path) -> Optional["LocalVectorIndex"]:
+        npy = stem.with_name(stem.name + ".npy")
+        if not npy.is_file():
+            return None
+        data = json.loads(stem.with_name(stem.name + ".json").read_text(encoding="utf-8"))
+        index = cls.__new__(cls)
+        index.contents = tuple(data["contents"])
+        index.metadatas = tuple(data["metadatas"])
+        # already normalized on save; read-only mapping so the page cache is shared across workers
+        index.matrix = np.load(npy, mmap_mode="r")
+        return index
+
+    def search(self, query_vector: List[float], k: int) -> List[Tuple[int, float]]:
+        if not len(self):
+            return []
+        q = np.asarray(query_vector, dtype=np.float32)
+        scores = self.matrix @ (q / (np.linalg.norm(q) or 1.0))
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+class LocalIndexRetriever(BaseRetriever):
+    """Drop-in for the Supabase similarity retrievers that searches an in-RAM mirror of the table."""
+
+    k: int = 5
+    _client: any = PrivateAttr(default=None)
+    _table_name: str = PrivateAttr()
+    _dataset: str = PrivateAttr(default=DEFAULT_DATASET)
+    _embeddings: any = PrivateAttr(default=None)
+    _index: Optional[Tuple[Optional[str], LocalVectorIndex]] = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, client, table_name: str, embeddings, dataset: str = DEFAULT_DATASET, **data):
+        super().__init__(**data)
+        self._client = client
+        self._table_name = table_name
+        self._dataset = dataset
+        self._embeddings = embeddings
+
+    @property
+    def _version_key(self) -> str:
+        return dataset_key(self._table_name, self._dataset)
+
+    def _snapshot(self, version: Optional[str]) -> LocalVectorIndex:
+        if version is None:
+            return LocalVectorIndex.from_supabase(self._client, self._table_name, dataset=self._dataset)
+        # "." never occurs in dataset names, so the glob below only sees this dataset's snapshots
+        stem = LOCAL_INDEX_DIR / f"{self._version_key}.{version[:16]}"
+        index = LocalVectorIndex.load(stem)
+        if index is None:
+            index = LocalVectorIndex.from_supabase(self._client, self._table_name, dataset=self._dataset)
+            index.save(stem)
+            for old in LOCAL_INDEX_DIR.glob(f"{self._version_key}.*"):
+                if not old.name.startswith(stem.name):
+                    old.unlink(missing_ok=True)  # mappings already open stay valid until dropped
+        return index
+
+    def refresh(self) -> LocalVectorIndex:
+        """Reload when the ingest version marker differs: from the shared snapshot, else Supabase."""
+        version = stored_fingerprint(self._version_key)
+        current = self._index
+        if current is not None and current[0] == version:
+            return current[1]
+        with self._lock:
+            current = self._index
+            if current is None or current[0] != version:
+                current = (version, self._snapshot(version))
+                self._index = current
+        return current[1]
+
+    def _documents(self, index: LocalVectorIndex, hits: List[Tuple[int, float]]) -> List[Document]:
+        return [
+            Document(page_content=index.contents[i], metadata={**index.metadatas[i], "score": score})
+            for i, score in hits
+        ]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        index = self.refresh()
+        return self._documents(index, index.search(self._embeddings.embed_query(query), self.k))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        index = self._index[1] if self._index is not None else None
+        if index is None or self._index[0] != stored_fingerprint(self._version_key):
+            index = await asyncio.to_thread(self.refresh)
+        vec = self._embeddings.cached_query(query) if hasattr(self._embeddings, "cached_query") else None
+        if vec is None:
+            vec = await asyncio.to_thread(self._embeddings.embed_query, query)
+        return self._documents(index, index.search(vec, self.k))
@@ -1,28 +1,77 @@
-from typing import List, Dict, Optional
+import asyncio
+from typing import Any, List, Dict, Optional, Union
 from pydantic import PrivateAttr
 from langchain_core.retrievers import BaseRetriever
 from langchain_core.documents import Document
-from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_google_genai import ChatGoogleGenerativeAI
+
+from graph.retrievals.label_router import LABELS, LocalLabelRouter, RouteDecision
+from graph.deadline import RETRIEVER_TIMEOUT_MS, RETRIEVE_SHARE, ROUTE_SHARE, ROUTER_TIMEOUT_MS, Deadline, within
+from graph.metrics import annotate, span
+from graph.llm import get_chat_model
 
 class RoutedDocsRetriever(BaseRetriever):
     _artifacts: Dict = PrivateAttr(default_factory=dict)
     _router_prompt: ChatPromptTemplate = PrivateAttr()
+    _labeler: Any = PrivateAttr(default=None)
+    _local_router: LocalLabelRouter = PrivateAttr()
 
-    def __init__(self, artifacts: Dict , prompt: ChatPromptTemplate, **data):
+    def __init__(self, artifacts: Dict , prompt: ChatPromptTemplate, local_router: Optional[LocalLabelRouter] = None, **data):
         super().__init__(**data)
         self._artifacts = artifacts
         self._router_prompt = prompt
+        self._labeler = self._router_prompt | get_chat_model() | StrOutputParser()
+        self._local_router = local_router or LocalLabelRouter()
+
+    def _remember(self, query: str, decision: RouteDecision) -> RouteDecision:
+        if decision.decided_by not in ("cache", "fallback") and decision.label in LABELS:
+            self._local_router.remember(query, decision)
+        annotate(label=decision.label, decided_by=decision.decided_by)
+        return decision
+
+    def _from_llm(self, query: str, label: str, deadline: Optional[Deadline] = None) -> RouteDecision:
+        if label in LABELS:
+            return RouteDecision(label, "llm")
+        # an unknown label must not fan out to every retriever
+        if deadline is not None:
+            deadline.degrade("route", "unknown_label", "local_guess")
+        return self._local_router.guess(query)
+
+    def route(self, query: str) -> RouteDecision:
+        # cached label -> local rules/centroids -> LLM only when the local guess is not confident
+        with span("route"):
+            decision = self._local_router.lookup(query) or self._local_router.classify(query)
+            if decision is None:
+                try:
+                    with span("router_llm"):
+                        label = self._labeler.invoke({"question": query}).strip().upper()
+                    decision = self._from_llm(query, label)
+                except Exception:
+                    decision = self._local_router.guess(query)
+        return self._remember(query, decision)
+
+    async def aroute(self, query: str, deadline: Optional[Deadline] = None) -> RouteDecision:
+        deadline = deadline or Deadline()
+        with span("route"):
+            decision = self._local_router.lookup(query) or self._local_router.classify(query)
+            if decision is None:
+                try:
+                    with span("router_llm"):
+                        label = await within(self._labeler.ainvoke({"question": query}),
+                                             deadline.timeout(ROUTER_TIMEOUT_MS, ROUTE_SHARE))
+                    decision = self._from_llm(query, label.strip().upper(), deadline)
+                except asyncio.TimeoutError:
+                    deadline.degrade("route", "timeout", "local_guess")
+                    decision = self._local_router.guess(query)
+                except Exception as e:
+                    deadline.degrade("route", type(e).__name__, "local_guess")
+                    decision = self._local_router.guess(query)
+        return self._remember(query, decision)
 
     def _pick_labels(self, query: str) -> str:
-        _router_llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.0)
-        _labeler = self._router_prompt | _router_llm | StrOutputParser()
-        try:
-            return _labeler.invoke({"question": query}).strip().upper()
-        except Exception:
-            return "SALES_COMPLETE+FAQ"
+        return self.route(query).label
 
     def _resolve_retrievers(self, label: str) -> List[Optional[BaseRetriever]]:
         faq = self._artifacts.get("retrieval_faq")
@@ -44,18 +93,24 @@ class RoutedDocsRetriever(BaseRetriever):
         if label == "SALES_SAMPLE+FAQ":
             print("Retrieving SALES SAMPLE + FAQ")
             return [sample, faq]
-        # Conservative default
-        print("Retrieving All retrievers")
-        return [complete, sample, faq]
+        # Unknown label: cheap top-k from both sources rather than every retriever
+        print("Retrieving SALES SAMPLE + FAQ (unknown label)")
+        return [sample, faq]
+
+    def _name(self, retr) -> Optional[str]:
+        return next((k for k, v in self._artifacts.items() if v is retr), None)
+
+    def _tag(self, retr, docs: List[Document]) -> List[Document]:
+        # record which artifact produced each document (context assembly groups by it);
+        # copies, so cached documents/snapshots are never mutated
+        name = self._name(retr)
+        return [Document(page_content=d.page_content, metadata={**d.metadata, "retriever": name}) for d in docs]
 
     def pick_retrievers(self, query: str):
         label = self._pick_labels(query)
         return [r for r in self._resolve_retrievers(label) if r is not None]
 
-    def _get_relevant_documents(
-        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
-    ) -> List[Document]:
-        label = self._pick_labels(query)
+    def retrieve(self, query: str, label: str, callbacks=None) -> List[Document]:
         chosen = [r for r in self._resolve_retrievers(label) if r is not None]
         if not chosen:
             raise RuntimeError("No retrievers configured in artifacts. Expected keys: "
@@ -63,13 +118,86 @@ class RoutedDocsRetriever(BaseRetriever):
 
         docs: List[Document] = []
         for retr in chosen:
-            if hasattr(retr, "invoke"):
-                docs.extend(retr.invoke(query, config={"callbacks": run_manager.get_child()}))
-            else:
-                docs.extend(retr.get_relevant_documents(query, callbacks=run_manager.get_child()))
+            with span("retriever", retriever=str(self._name(retr))):
+                if hasattr(retr, "invoke"):
+                    docs.extend(self._tag(retr, retr.invoke(query, config={"callbacks": callbacks})))
+                else:
+                    docs.extend(self._tag(retr, retr.get_relevant_documents(query, callbacks=callbacks)))
         return docs
 
-    async def _aget_relevant_documents(
+    def _get_relevant_documents(
         self, query: str, *, run_manager: CallbackManagerForRetrieverRun
     ) -> List[Document]:
-        return self._get_relevant_documents(query, run_manager=run_manager)
+        return self.retrieve(query, self._pick_labels(query), callbacks=run_manager.get_child())
+
+    async def _degraded(self, retr, query: str, deadline: Deadline) -> List[Document]:
+        """Cheaper stand-in for a retriever that ran out of time; never a heavier one."""
+        stage = f"retriever:{self._name(retr)}"
+        sample = self._artifacts.get("retrieval_sales")
+        if retr is self._artifacts.get("all_sales_retriever") and sample is not None:
+            try:
+                docs = await within(sample.ainvoke(query), deadline.timeout(RETRIEVER_TIMEOUT_MS, RETRIEVE_SHARE))
+                deadline.degrade(stage, "timeout", "top_k")
+                return self._tag(sample, docs)
+            except asyncio.TimeoutError:
+                retr = sample
+        if hasattr(retr, "lexical_search"):
+            deadline.degrade(stage, "timeout", "lexical")
+            return self._tag(retr, retr.lexical_search(query))
+        deadline.degrade(stage, "timeout", "skipped")
+        return []
+
+    async def aretrieve(self, query: str, label: str, callbacks=None,
+                        deadline: Optional[Deadline] = None) -> List[Document]:
+        chosen = [r for r in self._resolve_retrievers(label) if r is not None]
+        if not chosen:
+            raise RuntimeError("No retrievers configured in artifacts. Expected keys: "
+                               "'retrieval_faq', 'retrieval_sales', 'retrieval_all_sales'.")
+        deadline = deadline or Deadline()
+        # retrievers run side by side, so they share one timeout
+        timeout = deadline.timeout(RETRIEVER_TIMEOUT_MS, RETRIEVE_SHARE)
+
+        # fan out concurrently: multi-source labels cost the slowest retriever, not the sum
+        async def run(retr) -> List[Document]:
+            with span("retriever", retriever=str(self._name(retr))):
+                try:
+                    return self._tag(retr, await within(retr.ainvoke(query, config={"callbacks": callbacks}),
+                                                        timeout))
+                except asyncio.TimeoutError:
+                    pass
+            return await self._degraded(retr, query, deadline)
+
+        results = await asyncio.gather(*(run(r) for r in chosen))
+        return [d for docs in results for d in docs]
+
+    async def aretrieve_many(self, queries: List[str], label: str,
+                             max_concurrency: int = 8) -> List[Union[List[Document], Exception]]:
+        """Retrieve for a group of queries sharing one label; query-independent retrievers run once."""
+        chosen = [r for r in self._resolve_retrievers(label) if r is not None]
+        if not chosen:
+            raise RuntimeError("No retrievers configured in artifacts. Expected keys: "
+                               "'retrieval_faq', 'retrieval_sales', 'retrieval_all_sales'.")
+
+        async def run(retr) -> List[Union[List[Document], Exception]]:
+            if getattr(retr, "shared_across_queries", False):
+                try:
+                    shared = self._tag(retr, await retr.ainvoke(queries[0]))
+                except Exception as e:
+                    return [e] * len(queries)
+                return [shared] * len(queries)
+            results = await retr.abatch(queries, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+            return [r if isinstance(r, Exception) else self._tag(retr, r) for r in results]
+
+        per_retriever = await asyncio.gather(*(run(r) for r in chosen))
+        out: List[Union[List[Document], Exception]] = []
+        for i in range(len(queries)):
+            parts = [results[i] for results in per_retriever]
+            error = next((p for p in parts if isinstance(p, Exception)), None)
+            out.append(error if error is not None else [d for docs in parts for d in docs])
+        return out
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        decision = await self.aroute(query)
+        return await self.aretrieve(query, decision.label, callbacks=run_manager.get_child())
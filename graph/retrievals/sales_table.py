@@ -0,0 +1,196 @@
+import os
+import re
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from pydantic import PrivateAttr
+
+from graph.retrievals.loaders import MONTH_NAMES, SalesRow, iter_sales_rows, months_in
+
+SALES_TABLE_PATH = Path(os.environ.get("SALES_TABLE_PATH", "./uploads/.sales_table.npy"))
+# one record per row in a single .npy so workers can memory-map the same file read-only
+SALES_DTYPE = np.dtype([("month", np.int8), ("year", np.int16), ("total_sales", np.float64),
+                        ("transactions", np.int64)])
+MAX_LISTED_ROWS = 60
+MAX_LISTED_YEARS = 12  # per-year aggregate lines when the question names no year
+
+GREATER = re.compile(r"(?:above|over|greater than|more than|exceeding|>=?)\s*(\d+(?:\.\d+)?)")
+LESS = re.compile(r"(?:below|under|less than|fewer than|<=?)\s*(\d+(?:\.\d+)?)")
+
+class SalesTable:
+    """Typed column store for the Month/Year/Total_Sales/Transactions CSV with precomputed aggregates."""
+
+    def __init__(self, month: np.ndarray, year: np.ndarray, total_sales: np.ndarray, transactions: np.ndarray,
+                 presorted: bool = False):
+        if not presorted:
+            order = np.lexsort((month, year))
+            month, year, total_sales, transactions = month[order], year[order], total_sales[order], transactions[order]
+        # copy=False keeps memory-mapped columns as views of the shared file
+        self.month = month.astype(np.int8, copy=False)
+        self.year = year.astype(np.int16, copy=False)
+        self.total_sales = total_sales.astype(np.float64, copy=False)
+        self.transactions = transactions.astype(np.int64, copy=False)
+        self.by_year: Dict[int, np.ndarray] = {int(y): np.flatnonzero(self.year == y) for y in np.unique(self.year)}
+        self.by_month: Dict[int, np.ndarray] = {int(m): np.flatnonzero(self.month == m) for m in np.unique(self.month)}
+        self.year_aggregates = {y: self.aggregate(idx) for y, idx in self.by_year.items()}
+        self.overall = self.aggregate(np.arange(len(self)))
+
+    def __len__(self) -> int:
+        return int(self.year.shape[0])
+
+    @classmethod
+    def from_csv(cls, path: str, encoding: str = "utf-8") -> "SalesTable":
+        return cls.from_rows(iter_sales_rows(path, encoding))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[SalesRow]) -> "SalesTable":
+        builder = SalesTableBuilder()
+        for r in rows:
+            builder.add(r)
+        return builder.build()
+
+    def save(self, path: Path = SALES_TABLE_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        records = np.empty(len(self), dtype=SALES_DTYPE)
+        for name in SALES_DTYPE.names:
+            records[name] = getattr(self, name)
+        tmp = path.with_name(path.stem + ".tmp.npy")
+        np.save(tmp, records)
+        # rename, never rewrite in place: workers still mapping the old file keep a consistent view
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = SALES_TABLE_PATH) -> Optional["SalesTable"]:
+        if not path.is_file():
+            return None
+        try:
+            records = np.load(path, mmap_mode="r")
+        except ValueError:
+            return None  # older/foreign format: rebuilt on the next ingest
+        return cls(records["month"], records["year"], records["total_sales"], records["transactions"],
+                   presorted=True)
+
+    def aggregate(self, idx: np.ndarray) -> Dict[str, float]:
+        if idx.size == 0:
+            return {"count": 0}
+        s, t = self.total_sales[idx], self.transactions[idx]
+        return {
+            "count": int(idx.size),
+            "sales_sum": float(s.sum()),
+            "sales_avg": float(s.mean()),
+            "sales_min": float(s.min()),
+            "sales_max": float(s.max()),
+            "transactions_sum": int(t.sum()),
+            "transactions_avg": float(t.mean()),
+            "transactions_min": int(t.min()),
+            "transactions_max": int(t.max()),
+        }
+
+    def select(self, years: List[int] = (), months: List[int] = (), min_sales=None, max_sales=None) -> np.ndarray:
+        mask = np.ones(len(self), dtype=bool)
+        if years:
+            mask &= np.isin(self.year, years)
+        if months:
+            mask &= np.isin(self.month, months)
+        if min_sales is not None:
+            mask &= self.total_sales > min_sales
+        if max_sales is not None:
+            mask &= self.total_sales < max_sales
+        return np.flatnonzero(mask)
+
+    def render_rows(self, idx: np.ndarray) -> str:
+        lines = ["Month | Year | Total_Sales | Transactions"]
+        for i in idx:
+            lines.append(f"{MONTH_NAMES[self.month[i] - 1]} | {self.year[i]} | "
+                         f"{self.total_sales[i]:g} | {self.transactions[i]}")
+        return "\n".join(lines)
+
+    @staticmethod
+    def render_aggregates(title: str, agg: Dict[str, float]) -> str:
+        if not agg.get("count"):
+            return f"{title}: no rows"
+        return (f"{title}: rows={agg['count']}, Total_Sales sum={agg['sales_sum']:g} avg={agg['sales_avg']:.2f} "
+                f"min={agg['sales_min']:g} max={agg['sales_max']:g}; Transactions sum={agg['transactions_sum']} "
+                f"avg={agg['transactions_avg']:.2f} min={agg['transactions_min']} max={agg['transactions_max']}")
+
+    def context_for(self, query: str) -> str:
+        """Small computed context (filters, aggregates, matching rows) instead of every raw row."""
+        q = query.lower()
+        years = sorted({int(y) for y in re.findall(r"\b((?:19|20)\d{2})\b", q)} & set(self.by_year))
+        months = months_in(query)
+        gt, lt = GREATER.search(q), LESS.search(q)
+        idx = self.select(years, months, float(gt.group(1)) if gt else None, float(lt.group(1)) if lt else None)
+
+        filters = []
+        if years:
+            filters.append("Year in " + ", ".join(map(str, years)))
+        if months:
+            filters.append("Month in " + ", ".join(MONTH_NAMES[m - 1] for m in months))
+        if gt:
+            filters.append(f"Total_Sales > {gt.group(1)}")
+        if lt:
+            filters.append(f"Total_Sales < {lt.group(1)}")
+
+        parts = [f"Complete sales data: {len(self)} rows, years {min(self.by_year)}-{max(self.by_year)}."]
+        parts.append(self.render_aggregates("All rows", self.overall))
+        # per-year lines for the years asked about; otherwise the most recent few plus the extremes
+        listed = years or list(self.year_aggregates)[-MAX_LISTED_YEARS:]
+        if not years and len(self.year_aggregates) > MAX_LISTED_YEARS:
+            sums = {y: agg["sales_sum"] for y, agg in self.year_aggregates.items()}
+            parts.append(f"Highest Total_Sales year: {max(sums, key=sums.get)}; lowest: {min(sums, key=sums.get)}; "
+                         f"{len(sums) - len(listed)} earlier years not listed individually.")
+        for y in listed:
+            parts.append(self.render_aggregates(f"Year {y}", self.year_aggregates[y]))
+        if filters:
+            parts.append(self.render_aggregates("Filtered (" + "; ".join(filters) + ")", self.aggregate(idx)))
+        if idx.size <= MAX_LISTED_ROWS:
+            parts.append(self.render_rows(idx))
+        else:
+            parts.append(f"{idx.size} matching rows (not listed); use the aggregates above.")
+        return "\n".join(parts)
+
+class SalesTableBuilder:
+    """Accumulates typed columns row by row (compact arrays, no per-row objects)."""
+
+    def __init__(self):
+        self.month, self.year = array("b"), array("h")
+        self.total_sales, self.transactions = array("d"), array("q")
+
+    def add(self, r: SalesRow) -> None:
+        self.month.append(r.month)
+        self.year.append(r.year)
+        self.total_sales.append(r.total_sales)
+        self.transactions.append(r.transactions)
+
+    def build(self) -> SalesTable:
+        return SalesTable(np.frombuffer(self.month, dtype=np.int8), np.frombuffer(self.year, dtype=np.int16),
+                          np.frombuffer(self.total_sales, dtype=np.float64),
+                          np.frombuffer(self.transactions, dtype=np.int64))
+
+def build_sales_table(csv_path: str, encoding: str = "utf-8", path: Path = SALES_TABLE_PATH) -> SalesTable:
+    table = SalesTable.from_csv(csv_path, encoding)
+    table.save(path)
+    return table
+
+class SalesTableRetriever(BaseRetriever):
+    _table: SalesTable = PrivateAttr()
+
+    def __init__(self, table: SalesTable, **data):
+        super().__init__(**data)
+        self._table = table
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return [Document(page_content=self._table.context_for(query), metadata={"source": "sales_table"})]
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        # pure in-memory work: no need to hop to a thread
+        return [Document(page_content=self._table.context_for(query), metadata={"source": "sales_table"})]
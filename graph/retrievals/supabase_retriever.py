@@ -1,84 +1,97 @@
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.chains import RetrievalQA
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import (
-    CSVLoader,
-    TextLoader
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Set
+
+from graph.datasets import DEFAULT_DATASET, dataset_filter
+from Supabase.client import create_async_supabase_client, get_supabase_client
+from graph.retrievals.embedding_cache import get_embeddings
+from graph.retrievals.sales_table import SalesTable
+from graph.retrievals.local_index import LocalIndexRetriever
+from graph.retrievals.ingest_pipeline import IngestPipeline
+from graph.retrievals.all_csv_retriever import AllCSVRetriever
+from graph.retrievals.backends import (
+    FAQ_TABLE, HYBRID_RETRIEVAL, SALES_TABLE, Progress, StorageBackend, _no_progress, with_lexical,
 )
-from langchain_community.vectorstores import SupabaseVectorStore
 
-from pathlib import Path
-from typing import Optional
-from supabase import Client
+if TYPE_CHECKING:
+    from supabase import Client
 
-SALES_TABLE = "sales_collection"
-FAQ_TABLE = "faq_collection"
 QUERY_FN_FAQ = "match_documents_faq"
 QUERY_FN_SALES = "match_documents_sales"
+LOCAL_VECTOR_INDEX = os.environ.get("LOCAL_VECTOR_INDEX", "0") == "1"
+ID_PAGE_SIZE = 1000  # PostgREST default max-rows
+ID_FILTER_BATCH = 200  # ids per ... WHERE id IN (...); keeps the request URL short
 
-def table_is_empty(client: Client, table_name: str) -> bool:
+def table_is_empty(client: Client, table_name: str, dataset: Optional[str] = None) -> bool:
     try:
-        resp = client.table(table_name).select("id", count="exact").limit(1).execute()
+        query = client.table(table_name).select("id", count="exact")
+        if dataset is not None:
+            query = query.eq("metadata->>dataset", dataset)
+        resp = query.limit(1).execute()
         return (getattr(resp, "count", 0) or 0) == 0
     except Exception:
         return True
 
-def delete_all_rows(client: Client, table_name: str) -> int:
-    # UUID-safe, type-agnostic: DELETE WHERE id IS NOT NULL
-    resp = client.table(table_name).delete().not_.is_("id", None).execute()
+def delete_all_rows(client: Client, table_name: str, dataset: Optional[str] = None) -> int:
+    query = client.table(table_name).delete()
+    if dataset is not None:
+        query = query.eq("metadata->>dataset", dataset)
+    else:
+        # UUID-safe, type-agnostic: DELETE WHERE id IS NOT NULL
+        query = query.not_.is_("id", None)
+    resp = query.execute()
     data = getattr(resp, "data", None)
     return len(data) if isinstance(data, list) else 0
 
-def data_retriever(supabase_client: Client, CSV_PATH: Optional[str], TXT_PATH: Optional[str]):
-    embeddings = GoogleGenerativeAIEmbeddings(model="gemini-embedding-001")
-
-    csv_ok = bool(CSV_PATH and Path(CSV_PATH).is_file())
-    txt_ok = bool(TXT_PATH and Path(TXT_PATH).is_file())
-
-    # Clear both tables only when both inputs are present
-    if csv_ok and txt_ok:
-        delete_all_rows(supabase_client, SALES_TABLE)
-        delete_all_rows(supabase_client, FAQ_TABLE)
-
-    # Seed sales if empty
-    if table_is_empty(supabase_client, SALES_TABLE) and csv_ok:
-        csv_loader = CSVLoader(
-            file_path=CSV_PATH,
-            source_column="Year",
-            csv_args={"delimiter": ",", "quotechar": '"', "fieldnames": ["Month", "Year", "Total_Sales", "Transactions"]},
-            encoding="utf-8",
-        )
-        sales_docs = csv_loader.load()
-        if not sales_docs:
-            raise RuntimeError(f"No rows loaded from CSV: {CSV_PATH}")
-        SupabaseVectorStore.from_documents(
-            documents=sales_docs,
-            embedding=embeddings,
-            client=supabase_client,
-            table_name=SALES_TABLE,
-            query_name=QUERY_FN_SALES,
-            chunk_size=500,
-        )
-
-    # Seed FAQ if empty
-    if table_is_empty(supabase_client, FAQ_TABLE) and txt_ok:
-        faq_docs_src = TextLoader(str(Path(TXT_PATH)), encoding="utf-8").load()
-        if not faq_docs_src:
-            raise RuntimeError(f"No text loaded from TXT: {TXT_PATH}")
-        splitter = RecursiveCharacterTextSplitter(chunk_size=400, chunk_overlap=70)
-        faq_docs = splitter.split_documents(faq_docs_src)
-        if not faq_docs:
-            raise RuntimeError("Text splitter produced no FAQ chunks")
-        SupabaseVectorStore.from_documents(
-            documents=faq_docs,
-            embedding=embeddings,
-            client=supabase_client,
-            table_name=FAQ_TABLE,
-            query_name=QUERY_FN_FAQ,
-            chunk_size=500,
-        )
-
-    # 1) Open Supabase vector stores (persistent store)
+def iter_stored_row_ids(client: Client, table_name: str, dataset: str) -> Iterator[List[str]]:
+    start = 0
+    while True:
+        resp = (client.table(table_name).select("id").eq("metadata->>dataset", dataset)
+                .order("id").range(start, start + ID_PAGE_SIZE - 1).execute())
+        rows = getattr(resp, "data", None) or []
+        if rows:
+            yield [str(r["id"]) for r in rows]
+        if len(rows) < ID_PAGE_SIZE:
+            return
+        start += ID_PAGE_SIZE
+
+def existing_row_ids(client: Client, table_name: str, ids: List[str], dataset: str) -> Set[str]:
+    found: Set[str] = set()
+    for i in range(0, len(ids), ID_FILTER_BATCH):
+        resp = (client.table(table_name).select("id").eq("metadata->>dataset", dataset)
+                .in_("id", ids[i:i + ID_FILTER_BATCH]).execute())
+        found.update(str(r["id"]) for r in getattr(resp, "data", None) or [])
+    return found
+
+def delete_rows(client: Client, table_name: str, ids: Iterable[str]) -> int:
+    ids, deleted = list(ids), 0
+    for i in range(0, len(ids), ID_FILTER_BATCH):
+        resp = client.table(table_name).delete().in_("id", ids[i:i + ID_FILTER_BATCH]).execute()
+        data = getattr(resp, "data", None)
+        deleted += len(data) if isinstance(data, list) else 0
+    return deleted
+
+def open_retrievers(supabase_client: Client, local_index: bool = LOCAL_VECTOR_INDEX,
+                    hybrid: bool = HYBRID_RETRIEVAL, sales_table: Optional[SalesTable] = None,
+                    dataset: str = DEFAULT_DATASET) -> Dict:
+    embeddings = get_embeddings()
+
+    if local_index:
+        # In-RAM mirrors of the dataset's rows: top-k without the match_documents_* RPC
+        csv_retriever = LocalIndexRetriever(supabase_client, SALES_TABLE, embeddings, k=5, dataset=dataset)
+        faq_retriever = LocalIndexRetriever(supabase_client, FAQ_TABLE, embeddings, k=5, dataset=dataset)
+        csv_retriever.refresh()
+        faq_retriever.refresh()
+        retrievers = {
+            "retrieval_sales": csv_retriever,
+            "retrieval_faq": faq_retriever,
+        }
+        return with_lexical(retrievers, sales_table, dataset) if hybrid else retrievers
+
+    # Open Supabase vector stores (persistent store); langchain_community is slow to import
+    from langchain_community.vectorstores import SupabaseVectorStore
+
     vectorstore_csv = SupabaseVectorStore(
         client=supabase_client,
         embedding=embeddings,
@@ -92,18 +105,75 @@ def data_retriever(supabase_client: Client, CSV_PATH: Optional[str], TXT_PATH: O
         query_name=QUERY_FN_FAQ,
     )
 
+    # filter goes to the RPC as jsonb: match_documents_* keep rows whose metadata contains it
     csv_retriever = vectorstore_csv.as_retriever(
         search_type="similarity",
-        search_kwargs={"k": 5}
+        search_kwargs={"k": 5, "filter": dataset_filter(dataset)}
     )
     faq_retriever = vectorstore_faq.as_retriever(
         search_type="similarity",
-        search_kwargs={"k": 5}
+        search_kwargs={"k": 5, "filter": dataset_filter(dataset)}
     )
 
     # return both retrievers in dict type
-    return {
+    retrievers = {
         "retrieval_sales": csv_retriever,
         "retrieval_faq": faq_retriever,
     }
+    return with_lexical(retrievers, sales_table, dataset) if hybrid else retrievers
+
+class SupabaseBackend(StorageBackend):
+    """Rows in Supabase/pgvector; vector search through the match_documents_* RPCs."""
+
+    name = "supabase"
+
+    def __init__(self, client: Optional[Client] = None, async_client=None, local_index: bool = LOCAL_VECTOR_INDEX):
+        self._client = client
+        self.async_client = async_client
+        self.local_index = local_index
+
+    @property
+    def client(self) -> Client:
+        return self._client if self._client is not None else get_supabase_client()
 
+    def warm(self) -> None:
+        self.client
+        if not self.local_index:
+            from langchain_community.vectorstores import SupabaseVectorStore  # noqa: F401
+
+    async def aconnect(self) -> None:
+        if self.async_client is None:
+            self.async_client = await create_async_supabase_client()
+
+    def is_empty(self, table_name: str, dataset: str = DEFAULT_DATASET) -> bool:
+        return table_is_empty(self.client, table_name, dataset)
+
+    def delete_all(self, table_name: str, dataset: str = DEFAULT_DATASET) -> int:
+        return delete_all_rows(self.client, table_name, dataset)
+
+    def iter_stored_ids(self, table_name: str, dataset: str = DEFAULT_DATASET) -> Iterator[List[str]]:
+        return iter_stored_row_ids(self.client, table_name, dataset)
+
+    def existing_ids(self, table_name: str, ids: List[str], dataset: str = DEFAULT_DATASET) -> Set[str]:
+        return existing_row_ids(self.client, table_name, ids, dataset)
+
+    def delete_ids(self, table_name: str, ids: Iterable[str]) -> int:
+        return delete_rows(self.client, table_name, ids)
+
+    def pipeline(self, table_name: str, embeddings) -> IngestPipeline:
+        return IngestPipeline(self.client, table_name, embeddings)
+
+    def open_retrievers(self, sales_table: Optional[SalesTable] = None, hybrid: bool = HYBRID_RETRIEVAL,
+                        dataset: str = DEFAULT_DATASET) -> Dict:
+        return open_retrievers(self.client, self.local_index, hybrid, sales_table, dataset)
+
+    def full_scan_retriever(self, dataset: str = DEFAULT_DATASET) -> AllCSVRetriever:
+        return AllCSVRetriever(self.client, async_client=self.async_client, dataset=dataset)
+
+def ingest(supabase_client: Client, CSV_PATH: Optional[str], TXT_PATH: Optional[str],
+           progress: Progress = _no_progress) -> Dict[str, str]:
+    return SupabaseBackend(supabase_client).ingest(CSV_PATH, TXT_PATH, progress)
+
+def data_retriever(supabase_client: Client, CSV_PATH: Optional[str], TXT_PATH: Optional[str]):
+    ingest(supabase_client, CSV_PATH, TXT_PATH)
+    return open_retrievers(supabase_client)
@@ -1,21 +1,41 @@
 import time
+
+STARTED_AT = time.perf_counter()
+
+import asyncio
+import json
+import os
 import logging
+import threading
+from functools import partial
 from pathlib import Path
 from typing import List, Optional
 
-from fastapi import FastAPI, Request, UploadFile, File, HTTPException, status
+from fastapi import FastAPI, Query, Request, UploadFile, File, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from contextlib import asynccontextmanager
 
-from Supabase.client import supabase_client
 from graph.chains.routed_retrievalQA import retrieval_qa_chain
-from graph.retrievals.supabase_retriever import data_retriever
-from graph.retrievals.all_csv_retriever import AllCSVRetriever
+from graph.chains.answer_cache import AnswerCache
+from graph.retrievals.ingest_pipeline import last_run_stats
+from graph.retrievals.sales_table import SALES_TABLE_PATH, SalesTable, SalesTableRetriever
+from graph.retrievals.embedding_cache import get_embeddings
 from graph.retrievals.routed_retriever import RoutedDocsRetriever
 from graph.Prompts.prompt import PROMPT
 from graph.Prompts.router_prompt import ROUTER_PROMPT
-from graph.retrievals.supabase_retriever import table_is_empty
+from graph.registry import ChainRegistry
+from graph.jobs import IngestJob, IngestJobQueue
+from graph.metrics import defer_trace, finish_trace, render_prometheus, start_trace
+from graph.retrievals.label_router import LocalLabelRouter, normalize_question
+from graph.retrievals.backends import get_backend
+from graph.llm import get_chat_model
+from graph.coordination import get_coordinator
+from graph.datasets import DATASET_PATTERN, DEFAULT_DATASET, dataset_path
+
+IMPORT_SECONDS = time.perf_counter() - STARTED_AT
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,7 +49,32 @@ async def lifespan(app: FastAPI):
     logger.info("🎉 Application starting up...")
     UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
     logger.info("📁 Upload directory ready")
+    warm_start = time.perf_counter()
+    await warm_up()
+    app.state.coordinator = coordinator = get_coordinator()
+    # one chain registry and answer cache per dataset, created on first use
+    app.state.registries, app.state.answer_caches = {}, {}
+    app.state.datasets_lock = threading.Lock()
+    app.state.registry = registry_for(DEFAULT_DATASET)
+    app.state.answer_cache = app.state.answer_caches[DEFAULT_DATASET]
+    app.state.jobs = IngestJobQueue(run_ingest_job, max_workers=INGEST_WORKERS,
+                                    on_update=lambda job: coordinator.save_job(job.id, job.to_dict(), job.dataset))
+    # record 'populated' for data ingested before it was tracked; requests only read the recorded flag
+    for name in {DEFAULT_DATASET, *coordinator.datasets()}:
+        if coordinator.populated(name) is None:
+            coordinator.set_populated(name, await run_in_threadpool(stores_populated, name))
+    if coordinator.populated(DEFAULT_DATASET):
+        data_version = await run_in_threadpool(coordinator.version, DEFAULT_DATASET)
+        await run_in_threadpool(app.state.registry.rebuild, data_version)
+        logger.info(f"🔗 QA chain ready (existing {get_backend().name} data, v{data_version})")
+    app.state.startup = {
+        "import_s": round(IMPORT_SECONDS, 3),
+        "warmup_s": round(time.perf_counter() - warm_start, 3),
+        "first_request_s": None,
+    }
+    logger.info(f"⏱️ Imports took {IMPORT_SECONDS:.2f}s, warm-up {app.state.startup['warmup_s']:.2f}s")
     yield
+    app.state.jobs.shutdown()
     logger.info("🛑 Application shutting down... Bye!")
 
 app = FastAPI(
@@ -41,10 +86,19 @@ app = FastAPI(
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start = time.time()
+    start = time.perf_counter()
+    trace = start_trace()
     logger.info(f"📥 {request.method} {request.url.path} - start")
     response = await call_next(request)
-    elapsed = time.time() - start
+    elapsed = time.perf_counter() - start
+    startup = getattr(request.app.state, "startup", None)
+    if startup is not None and startup["first_request_s"] is None:
+        startup["first_request_s"] = round(time.perf_counter() - STARTED_AT, 3)
+        logger.info(f"⏱️ First request served {startup['first_request_s']:.2f}s after import started")
+    # label by route template (/jobs/{job_id}) so metric cardinality stays bounded; 404s share one label
+    route = request.scope.get("route")
+    if not trace.get("deferred"):
+        finish_trace(trace, request.method, getattr(route, "path", "<unmatched>"), response.status_code, elapsed)
     logger.info(f"📤 {request.method} {request.url.path} -> {response.status_code} in {elapsed:.3f}s")
     return response
 
@@ -61,30 +115,115 @@ app.add_middleware(
 )
 
 UPLOAD_DIR = Path("./uploads")
-
-app.state.csv_path: Optional[str] = None
-app.state.txt_path: Optional[str] = None
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "1"))
 
 DOCS_TABLE = "documents"
 
 class AskIn(BaseModel):
     q: str
+    dataset: str = Field(DEFAULT_DATASET, pattern=DATASET_PATTERN)
+    budget_ms: Optional[float] = Field(None, gt=0)  # latency budget; slow stages degrade instead of waiting
+
+class AskBatchIn(BaseModel):
+    questions: List[str]
+    max_concurrency: int = 8
+    dataset: str = Field(DEFAULT_DATASET, pattern=DATASET_PATTERN)
+
+async def warm_up() -> None:
+    """Open the storage backend and load the models concurrently."""
+    backend = get_backend()
+    await asyncio.gather(
+        backend.aconnect(),
+        run_in_threadpool(backend.warm),
+        run_in_threadpool(get_embeddings),
+        run_in_threadpool(get_chat_model),
+    )
+
+def registry_for(dataset: str) -> ChainRegistry:
+    registry = app.state.registries.get(dataset)
+    if registry is None:
+        with app.state.datasets_lock:
+            registry = app.state.registries.get(dataset)
+            if registry is None:
+                app.state.answer_caches[dataset] = AnswerCache(get_embeddings())
+                registry = ChainRegistry(partial(build_chain, dataset=dataset))
+                app.state.registries[dataset] = registry
+    return registry
 
-def collection_ready() -> bool:
-    return bool(app.state.csv_path and app.state.txt_path)
+def collection_ready(dataset: str = DEFAULT_DATASET) -> bool:
+    # ready = a chain over the latest shared data exists and no worker is still ingesting
+    registry, coordinator = app.state.registries.get(dataset), app.state.coordinator
+    return (registry is not None and registry.current() is not None and app.state.jobs.pending(dataset) == 0
+            and coordinator.leader(dataset) is None
+            and registry.data_version >= coordinator.cached_version(dataset)
+            and bool(coordinator.populated(dataset)))
 
-def build_chain():
-    if not collection_ready():
-        if table_is_empty(supabase_client, "sales_collection") or table_is_empty(supabase_client, "faq_collection"):
-            raise HTTPException(status_code=409, detail="Collection empty. Upload a CSV and a TXT via /upload first.")
-        artifacts = data_retriever(supabase_client, None, None)  # returns dict with 'supabase' and 'faiss'
-        artifacts["all_sales_retriever"] = AllCSVRetriever(supabase_client)
+def stores_populated(dataset: str = DEFAULT_DATASET) -> bool:
+    # blocking backend count queries: ingest threads and startup only
+    return get_backend().populated(dataset)
+
+def build_chain(version: int = 0, dataset: str = DEFAULT_DATASET):
+    # Ingestion happens in /upload; here we only open the existing stores
+    # Precomputed column store from ingest; page the whole table only when it is missing
+    sales_table = SalesTable.load(dataset_path(SALES_TABLE_PATH, dataset))
+    artifacts = get_backend().open_retrievers(sales_table=sales_table, dataset=dataset)
+    if sales_table is not None:
+        artifacts["all_sales_retriever"] = SalesTableRetriever(sales_table)
     else:
-        artifacts = data_retriever(supabase_client, app.state.csv_path, app.state.txt_path)
-        artifacts["all_sales_retriever"] = AllCSVRetriever(supabase_client)
+        artifacts["all_sales_retriever"] = get_backend().full_scan_retriever(dataset)
 
-    retrieval_routed = RoutedDocsRetriever(artifacts, ROUTER_PROMPT)
-    return retrieval_qa_chain(PROMPT, retrieval_routed)
+    local_router = LocalLabelRouter(get_embeddings())
+    try:
+        local_router.warm()
+    except Exception:
+        logger.exception("Router centroids unavailable; using keyword rules + LLM only")
+    retrieval_routed = RoutedDocsRetriever(artifacts, ROUTER_PROMPT, local_router)
+    return retrieval_qa_chain(PROMPT, retrieval_routed, app.state.answer_caches[dataset], version)
+
+def run_ingest_job(job: IngestJob) -> dict:
+    csv_new = next((p for p in job.files if p.lower().endswith(".csv")), None)
+    txt_new = next((p for p in job.files if p.lower().endswith(".txt")), None)
+    dataset, coordinator = job.dataset, app.state.coordinator
+    registry = registry_for(dataset)
+    # one ingestion leader per dataset across all workers; other uploads queue behind its lease
+    with coordinator.leadership(dataset, on_wait=lambda: job.progress("waiting")):
+        ingested = get_backend().ingest(csv_new, txt_new, job.progress, dataset)
+        changed = any(v == "ingested" for v in ingested.values())
+        # recorded before the version bump, so workers that see the new version also see the flag
+        populated = stores_populated(dataset)
+        coordinator.set_populated(dataset, populated)
+        data_version = coordinator.bump_version(dataset) if changed else coordinator.version(dataset)
+    if (changed or registry.current() is None or registry.data_version < data_version) and populated:
+        job.progress("building", job.done, job.total)
+        registry.rebuild(data_version)
+    logger.info(f"📦 Ingestion job {job.id} [{dataset}] finished: {ingested} (chain v{registry.version})")
+    return {
+        "ingestion": ingested,
+        "throughput": {t: last_run_stats.get(t) for t, v in ingested.items() if v == "ingested"},
+        "chain_version": registry.version,
+        "data_version": data_version,
+    }
+
+def current_chain(dataset: str = DEFAULT_DATASET):
+    data_version = app.state.coordinator.cached_version(dataset)
+    if data_version == 0 and dataset not in app.state.registries:
+        # never ingested anywhere: don't allocate a registry for an unknown name
+        raise HTTPException(status_code=409, detail=f"Dataset '{dataset}' is empty. "
+                                                    f"Upload a CSV and a TXT via /upload?dataset={dataset} first.")
+    registry = registry_for(dataset)
+    # another worker published newer data: rebuild off the request path, keep serving the old chain meanwhile;
+    # like run_ingest_job, never build over a dataset still missing its CSV or TXT
+    stale = data_version > registry.data_version
+    populated = stale and bool(app.state.coordinator.populated(dataset))
+    refreshing = populated and registry.refresh_in_background(data_version)
+    chain = registry.current()
+    if chain is None:
+        if refreshing or populated:
+            raise HTTPException(status_code=409, detail=f"Dataset '{dataset}' v{data_version} is loading; "
+                                                        "retry shortly.")
+        raise HTTPException(status_code=409, detail=f"Dataset '{dataset}' is empty. "
+                                                    f"Upload a CSV and a TXT via /upload?dataset={dataset} first.")
+    return chain
 
 
 ALLOWED_EXTS = {".csv", ".txt"}
@@ -97,7 +236,8 @@ def _is_allowed(file: UploadFile) -> bool:
     return ext_ok and mime_ok
 
 @app.post("/upload")
-async def upload(files: List[UploadFile] = File(...)):
+async def upload(files: List[UploadFile] = File(...),
+                 dataset: str = Query(DEFAULT_DATASET, pattern=DATASET_PATTERN)):
     if not files:
         raise HTTPException(status_code=400, detail="No files provided.")
     violations = [
@@ -115,26 +255,51 @@ async def upload(files: List[UploadFile] = File(...)):
             },
         )
     saved = []
+    csv_path = txt_path = None
+    # datasets upload into their own directory so same-named files never overwrite each other
+    upload_dir = UPLOAD_DIR if dataset == DEFAULT_DATASET else UPLOAD_DIR / dataset
     try:
+        await run_in_threadpool(upload_dir.mkdir, parents=True, exist_ok=True)
         for f in files:
-            dest = UPLOAD_DIR / f.filename
-            with dest.open("wb") as out:
-                for chunk in iter(lambda: f.file.read(1024 * 1024), b""):
-                    out.write(chunk)
+            dest = upload_dir / f.filename
+            # stream to disk without blocking the event loop
+            out = await run_in_threadpool(dest.open, "wb")
+            try:
+                while chunk := await f.read(1024 * 1024):
+                    await run_in_threadpool(out.write, chunk)
+            finally:
+                await run_in_threadpool(out.close)
             saved.append(str(dest))
             if f.filename.lower().endswith(".csv"):
-                app.state.csv_path = str(dest)
+                csv_path = str(dest)
             elif f.filename.lower().endswith(".txt"):
-                app.state.txt_path = str(dest)
-        return {
-            "uploaded": len(saved),
-            "files": saved,
-            "csv_path": app.state.csv_path,
-            "txt_path": app.state.txt_path,
-            "ready": collection_ready(),
-        }
+                txt_path = str(dest)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    # the active files live in the shared store so every worker sees this upload
+    state = await run_in_threadpool(app.state.coordinator.set_files, dataset, csv_path, txt_path)
+    job = app.state.jobs.submit(saved, dataset)
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={
+        "dataset": dataset,
+        "uploaded": len(saved),
+        "files": saved,
+        "csv_path": state["csv_path"],
+        "txt_path": state["txt_path"],
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "ready": collection_ready(dataset),
+    })
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = app.state.jobs.get(job_id)
+    if job is not None:
+        return job.to_dict()
+    # submitted to another worker: serve its last published snapshot
+    snapshot = await run_in_threadpool(app.state.coordinator.job, job_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Unknown job id.")
+    return snapshot
 
 @app.get("/upload")
 async def upload_info():
@@ -146,7 +311,36 @@ async def upload_info():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "ready": collection_ready()}
+    return {
+        "status": "healthy",
+        "ready": collection_ready(),
+        "ingesting": app.state.jobs.pending(),
+        "chain_version": app.state.registry.version,
+        "data_version": app.state.registry.data_version,
+        "dataset": app.state.coordinator.dataset(DEFAULT_DATASET),
+        "ingest_leader": app.state.coordinator.leader(DEFAULT_DATASET),
+        "worker": app.state.coordinator.owner,
+        "storage": get_backend().name,
+        "embedding_cache": get_embeddings().cache.stats(),
+        "answer_cache": app.state.answer_cache.stats,
+        "datasets": {name: dataset_status(name) for name in app.state.coordinator.datasets()},
+        "startup": app.state.startup,
+    }
+
+def dataset_status(dataset: str) -> dict:
+    registry, state = app.state.registries.get(dataset), app.state.coordinator.dataset(dataset)
+    return {
+        "ready": collection_ready(dataset),
+        "data_version": state["version"],
+        "chain_version": registry.version if registry is not None else None,
+        "csv_path": state["csv_path"],
+        "txt_path": state["txt_path"],
+        "ingest_leader": app.state.coordinator.leader(dataset),
+    }
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def root():
@@ -155,21 +349,76 @@ async def root():
         "ready": collection_ready(),
         "endpoints": {
             "health": "/health",
-            "upload": "/upload (POST, multipart form-data: files)",
-            "ask": "/ask (POST, JSON: {q})",
+            "metrics": "/metrics (Prometheus text format)",
+            "upload": "/upload?dataset=<name> (POST, multipart form-data: files; dataset defaults to 'default')",
+            "jobs": "/jobs/{job_id} (GET, ingestion progress)",
+            "ask": "/ask (POST, JSON: {q, dataset?, budget_ms?})",
+            "ask_batch": "/ask/batch (POST, JSON: {questions, max_concurrency, dataset?})",
+            "ask_stream": "/ask/stream (POST, JSON: {q, dataset?, budget_ms?}; Server-Sent Events)",
         },
     }
 
 @app.post("/ask")
 async def ask(body: AskIn):
-    chain = build_chain()
+    chain = current_chain(body.dataset)
     try:
-        output = chain.invoke(body.q)
-        return {"query": body.q, "result": output}
+        output = await chain.ainvoke({"query": body.q, "budget_ms": body.budget_ms})
+        route = output.pop("route", None)
+        cache = output.pop("cache", None)
+        degraded = output.pop("degraded", [])
+        return {"query": body.q, "dataset": body.dataset, "result": output, "route": route, "cache": cache,
+                "degraded": degraded}
     except Exception as e:
         logger.exception("Ask failed")
         raise HTTPException(status_code=500, detail=f"Ask failed: {str(e)}")
 
+@app.post("/ask/batch")
+async def ask_batch(body: AskBatchIn):
+    if not body.questions:
+        raise HTTPException(status_code=400, detail="No questions provided.")
+    chain = current_chain(body.dataset)
+    start = time.perf_counter()
+    try:
+        results = await chain.abatch(body.questions, max(1, min(body.max_concurrency, 32)))
+    except Exception as e:
+        logger.exception("Batch ask failed")
+        raise HTTPException(status_code=500, detail=f"Batch ask failed: {str(e)}")
+    return {
+        "dataset": body.dataset,
+        "count": len(results),
+        "unique": len({normalize_question(q) for q in body.questions}),
+        "errors": sum(1 for r in results if "error" in r),
+        "elapsed_ms": (time.perf_counter() - start) * 1000,
+        "results": [
+            {"query": r["query"], "route": r.get("route"), "cache": r.get("cache"),
+             **({"error": r["error"]} if "error" in r else {"result": {"query": r["query"], "result": r["result"]}})}
+            for r in results
+        ],
+    }
+
+@app.post("/ask/stream")
+async def ask_stream(body: AskIn):
+    chain = current_chain(body.dataset)
+    # call_next returns before the body streams: the stream itself observes the request
+    trace, start = defer_trace(), time.perf_counter()
+
+    async def events():
+        timings = {}
+        try:
+            async for event, data in chain.astream({"query": body.q, "budget_ms": body.budget_ms}):
+                if event == "done":
+                    timings = data
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            logger.exception("Ask stream failed")
+            yield f"event: error\ndata: {json.dumps({'detail': f'Ask failed: {str(e)}'})}\n\n"
+        if timings:
+            logger.info(f"⏱️ /ask/stream ttft={timings['ttft_ms'] or 0:.1f}ms total={timings['total_ms']:.1f}ms")
+        if trace is not None:
+            finish_trace(trace, "POST", "/ask/stream", status.HTTP_200_OK, time.perf_counter() - start)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.get("/ask")
 async def ask_info():
     return {"detail": "Use POST /ask with JSON body {\"q\": \"...\"}"}
@@ -1,18 +1,22 @@
 from Supabase.client import supabase_client
-from graph.graph import llm_chain
-from graph.retrievals.supabase_retriever import data_retriever, all_csv_docs_retriever
+from graph.chains.routed_retrievalQA import retrieval_qa_chain
+from graph.retrievals.supabase_retriever import data_retriever
+from graph.retrievals.all_csv_retriever import AllCSVRetriever
+from graph.retrievals.routed_retriever import RoutedDocsRetriever
 from graph.Prompts.prompt import PROMPT
+from graph.Prompts.router_prompt import ROUTER_PROMPT
 
 CSV_PATH = "assets/sales_data.csv"
 TXT_PATH = "assets/faq_data.txt"
 
-retrievers = [data_retriever(supabase_client, CSV_PATH, TXT_PATH), all_csv_docs_retriever(supabase_client)]
+artifacts = data_retriever(supabase_client, CSV_PATH, TXT_PATH)
+artifacts["all_sales_retriever"] = AllCSVRetriever(supabase_client)
 
 if __name__ == '__main__':
-    chain = llm_chain(retrievers, PROMPT)
+    chain = retrieval_qa_chain(PROMPT, RoutedDocsRetriever(artifacts, ROUTER_PROMPT))
 
     user_query = input("Enter user query: \n")
     result = chain.invoke(user_query)
     print("-----------------------------------\n")
     print("User Query: ", user_query)
-    print("Result: ", result)
\ No newline at end of file
+    print("Result: ", result["result"])
\ No newline at end of file